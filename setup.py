@@ -32,6 +32,7 @@ setup(name='pyaxl',
       package_dir={'': 'src'},
       include_package_data=True,
       zip_safe=False,
+      python_requires='>=3.6',
       install_requires=[
           'setuptools',
           'suds-jurko'
@@ -41,5 +42,6 @@ setup(name='pyaxl',
       ],
       test_suite='pyaxl.testing.test_suite',
       entry_points={
-          'console_scripts': ['pyaxl_import_wsdl = pyaxl.axlhandler:import_wsdl'],
+          'console_scripts': ['pyaxl_import_wsdl = pyaxl.axlhandler:import_wsdl',
+                              'pyaxl_benchmark = pyaxl.testing.benchmark:main'],
       })
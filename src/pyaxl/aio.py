@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import functools
+import threading
+import pyaxl
+from concurrent.futures import ThreadPoolExecutor
+
+
+log = logging.getLogger('pyaxl')
+
+
+class AsyncRunner(object):
+    """ Run blocking AXL calls for asyncio. Each configuration has its
+        own executor, the number of threads is the maximum of requests
+        in flight. The threads take their clients from the pool of the
+        configuration, so the pool_size should be as big as the async_limit.
+    """
+
+    runners = dict()
+    lock = threading.Lock()
+
+    def __init__(self, configname, limit):
+        self.configname = configname
+        self.limit = limit
+        self.executor = ThreadPoolExecutor(max_workers=limit)
+
+    @classmethod
+    def get_runner(cls, configname='default'):
+        """ return a single instance of runner for each configuration.
+        """
+        with cls.lock:
+            if configname not in cls.runners:
+                config = pyaxl.configuration.registry.get(configname)
+                limit = config.async_limit or config.pool_size
+                log.debug('create async runner for "%s", limit=%s' % (configname, limit))
+                cls.runners[configname] = AsyncRunner(configname, limit)
+            return cls.runners[configname]
+
+    def ensure(self, func, *args, **kwargs):
+        """ start the call in the executor and return an awaitable future.
+        """
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+
+def run(configname, func, *args, **kwargs):
+    """ call func in the executor of a configuration and return
+        an awaitable with the result.
+    """
+    return AsyncRunner.get_runner(configname).ensure(func, *args, **kwargs)
+
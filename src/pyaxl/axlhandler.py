@@ -1,17 +1,47 @@
+import io
 import os
+import gc
 import sys
+import queue
+import pickle
 import pyaxl
 import shutil
+import hashlib
 import logging
+import threading
 import fnmatch
 import argparse
+from collections import OrderedDict
+from collections.abc import Mapping
+from collections.abc import Sequence
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
 
 from suds.xsd import doctor
+from copy import deepcopy
 from suds.client import Client
+from suds.client import Factory
+from suds.client import ServiceSelector
+from suds.options import Options
+from suds.properties import Unskin
 from suds.reader import Reader
+from suds.reader import DefinitionsReader
+from suds.wsdl import Definitions
 from suds.cache import ObjectCache
 from suds.plugin import MessagePlugin
+from suds.plugin import PluginContainer
+from suds.servicedefinition import ServiceDefinition
+from suds.xsd.sxbase import SchemaObject
 from suds.transport.http import HttpAuthenticated
+from pyaxl.utils import copy_object
+from pyaxl.templates import TemplateMethod
+from pyaxl.templates import EnvelopeCache
+from pyaxl.ratelimit import RateLimitedTransport
+from pyaxl.metrics import InstrumentedMethod
+from pyaxl.metrics import InstrumentedTransport
+from pyaxl.transport import ConnectionPool
+from pyaxl.transport import KeepAliveTransport
 
 if os.name == 'posix':
     FILE_PREFIX = 'file://%s'
@@ -20,6 +50,11 @@ elif os.name == 'nt':
 else:
     raise EnviromentError('system "%s" not supported' % os.name)
 AXLAPI = 'AXLAPI.wsdl'
+BUNDLE = 'bundle'
+# the top-level items of a schema, a bundle loads them one by one
+SCHEMA_ITEMS = ('elements', 'types', 'attributes', 'groups', 'agrps')
+# directory with the caches and bundles of the configurations
+CACHE_PATH = os.path.join(os.path.dirname(pyaxl.__file__), 'cache')
 
 Logger = logging.Logger('pyaxl')
 
@@ -53,8 +88,7 @@ class AXLImportDoctor(doctor.ImportDoctor):
 
 
 class DebugTransportPlugin(MessagePlugin):
-    """ special http transport that will ask for sending each
-        request.
+    """ plugin that will ask for sending each request.
     """
 
     def sending(self, context):
@@ -64,7 +98,7 @@ class DebugTransportPlugin(MessagePlugin):
         print('=' * 100)
         msg = '\nAre you sure you want to send this request to callmanager? [yes|no]'
         if input(msg).lower() in ('yes', 'y'):
-            return super(DebugHttpAuthenicated, self).send(request)
+            return
         print('request aborted!')
         sys.exit(1)
 
@@ -74,6 +108,9 @@ class AXLClient(Client):
     """
 
     clients = dict()
+    pools = dict()
+    lock = threading.Lock()
+    local = threading.local()
 
     def __init__(self, configname='default'):
 
@@ -89,7 +126,8 @@ class AXLClient(Client):
                 raise Exception('Path for cache doesn\'t exist')
             with open(cachefiles) as f:
                 wsdl = f.readline().strip()
-                importdoctor = doctor.ImportDoctor(*[doctor.Import(l.strip()) for l in f.readlines()])
+                imports = [l.strip() for l in f.readlines()]
+                importdoctor = doctor.ImportDoctor(*[doctor.Import(i) for i in imports])
         else:
             schema_path = config.schema_path
             wsdl = os.path.join(schema_path, AXLAPI)
@@ -97,39 +135,550 @@ class AXLClient(Client):
                 raise ValueError('The version %s is not supported. WSDL was not found.' % config.version)
             wsdl = FILE_PREFIX % wsdl
             importdoctor = AXLImportDoctor(schema_path)
-        httpconfig = dict(username=config.user, password=config.passwd, proxy=config.proxy)
-        transport = HttpAuthenticated(**httpconfig)
+            imports = [i.ns for i in importdoctor.imports]
         plugins = list()
         if config.transport_debugger:
             plugins.append(DebugTransportPlugin())
 
-        kwargs = dict(cache=get_cache(configname),
+        cache, cachingpolicy = get_cache(configname), 0
+        bundle = None
+        if config.suds_config.get('cachingpolicy', 1) == 1 and 'cache' not in config.suds_config:
+            digest = get_bundle_digest(configname, [wsdl] + imports)
+            if digest is not None:
+                bundle = get_bundle(configname, digest)
+        if bundle is not None and bundle.preload(bundle_id(wsdl)):
+            cache, cachingpolicy = bundle, 1
+        kwargs = dict(cache=cache,
+                      cachingpolicy=cachingpolicy,
                       location='%s/%s' % (config.host, config.path),
                       doctor=importdoctor,
                       plugins=plugins,
-                      transport=transport)
+                      transport=self._transport(config, configname))
         kwargs.update(config.suds_config)
-        super(AXLClient, self).__init__(wsdl, **kwargs)
+        # the same as Client.__init__ of suds, but the service definitions
+        # are built on first use, see sd
+        self.options = Options()
+        self.set_options(**kwargs)
+        self.wsdl = DefinitionsReader(self.options, Definitions).open(wsdl)
+        PluginContainer(self.options.plugins).init.initialized(wsdl=self.wsdl)
+        self.factory = Factory(self.wsdl)
+        self.service = ServiceSelector(self, self.wsdl.services)
+        self.messages = dict(tx=None, rx=None)
+        if cachingpolicy == 0:
+            # the service definitions register the namespace prefixes
+            # (ns0, ...) in the WSDL, a bundle has them already
+            self.sd
+        if bundle is not None and cachingpolicy == 0:
+            # the bundle is missing or broken, write it for the next client
+            bundle.put(bundle_id(wsdl), self.wsdl)
+        self._wrap_transport(config, configname)
+        self.configname = configname
+        self.prototypes = dict()
+        self.keylists = dict()
+        self.envelopes = EnvelopeCache()
+
+    @property
+    def sd(self):
+        """ the service definitions of suds, only used to print the client.
+            They resolve all types of the schema, which would load the
+            whole bundle, so they are built when they're used first.
+        """
+        sd = self.__dict__.get('_sd')
+        if sd is None:
+            sd = self._sd = [ServiceDefinition(self.wsdl, s) for s in self.wsdl.services]
+        return sd
+
+    def _transport(self, config, configname):
+        """ create a new transport for the given configuration. With
+            keepalive the connections are shared by all clients of the
+            configuration.
+        """
+        httpconfig = dict(username=config.user, password=config.passwd, proxy=config.proxy)
+        if config.keepalive:
+            return KeepAliveTransport(pool=ConnectionPool.get_pool(configname), **httpconfig)
+        return HttpAuthenticated(**httpconfig)
+
+    def _wrap_transport(self, config, configname):
+        """ measure the requests (see pyaxl.metrics) and send them through
+            the rate limiters of the configuration (see pyaxl.ratelimit).
+        """
+        transport = self.options.transport
+        if config.instrumentation:
+            transport = InstrumentedTransport(transport)
+        if config.rate_limit_read or config.rate_limit_write:
+            transport = RateLimitedTransport(transport, configname, config.rate_limit_retries)
+        if transport is not self.options.transport:
+            self.set_options(transport=transport)
+
+    def clone(self):
+        """ return a new client that shares the parsed WSDL with this
+            client but has its own options and transport. A transport
+            given with suds_config is copied.
+        """
+        config = pyaxl.configuration.registry.get(self.configname)
+        options = dict(Unskin(self.options).defined)
+        if 'transport' in config.suds_config:
+            options['transport'] = deepcopy(config.suds_config['transport'])
+        else:
+            options['transport'] = self._transport(config, self.configname)
+        clone = self.__class__.__new__(self.__class__)
+        clone.options = Options()
+        clone.set_options(**options)
+        clone.set_options(**dict([(k, v) for k, v in config.suds_config.items() if k != 'transport']))
+        clone._wrap_transport(config, self.configname)
+        clone.wsdl = self.wsdl
+        clone.factory = self.factory
+        clone.service = ServiceSelector(clone, self.wsdl.services)
+        clone.messages = dict(tx=None, rx=None)
+        clone.configname = self.configname
+        clone.prototypes = self.prototypes
+        clone.keylists = self.keylists
+        clone.envelopes = self.envelopes
+        return clone
+
+    def operation(self, name):
+        """ return the method to call an AXL operation. The operations in
+            template_operations of the configuration are called with
+            envelope templates, see pyaxl.templates, unless plugins are
+            configured (e.g. transport_debugger). With instrumentation
+            each call is measured, see pyaxl.metrics.
+        """
+        config = pyaxl.configuration.registry.get(self.configname)
+        if name in config.template_operations and not self.options.plugins:
+            method = TemplateMethod(self, name)
+        else:
+            method = getattr(self.service, name)
+        if config.instrumentation:
+            return InstrumentedMethod(method, self.configname, name)
+        return method
+
+    def builder(self):
+        """ return a clone of this client which only builds the requests
+            (suds option nosend), see pyaxl.fastparse.
+        """
+        builder = self.__dict__.get('_builder')
+        if builder is None:
+            builder = self.clone()
+            builder.set_options(nosend=True)
+            self._builder = builder
+        return builder
+
+    def prototype(self, name):
+        """ return the empty object of a xsd type. It's built only once
+            by the factory, so don't change it.
+        """
+        prototype = self.prototypes.get(name)
+        if prototype is None:
+            prototype = self.prototypes.setdefault(name, self.factory.create(name))
+        return prototype
+
+    def create_empty(self, name):
+        """ return a new empty object of a xsd type as copy of the prototype.
+        """
+        return copy_object(self.prototype(name))
+
+    def keylist(self, name, index=None):
+        """ return the tags of a xsd type as set. With index the tags of
+            a nested object are returned, e.g. of the object in a request wrapper.
+        """
+        key = name, index
+        keylist = self.keylists.get(key)
+        if keylist is None:
+            xtype = self.prototype(name)
+            if index is not None:
+                xtype = xtype[index]
+            keylist = self.keylists.setdefault(key, frozenset(xtype.__keylist__))
+        return keylist
 
     @classmethod
     def get_client(cls, configname='default', recreate=False):
         """ return a single instance of client for each configuration.
+            Inside of a checkout the client from the pool is returned.
+        """
+        checkedout = getattr(cls.local, 'clients', dict()).get(configname)
+        if checkedout and not recreate:
+            return checkedout[-1]
+        with cls.lock:
+            client = None
+            if configname not in cls.clients or recreate:
+                client = AXLClient(configname)
+            return cls.clients.setdefault(configname, client)
+
+    @classmethod
+    def bind(cls, obj, configname='default'):
+        """ set the client of get_client on an object. An object bound
+            inside of a checkout is bound to the shared client again
+            when the client is given back to the pool.
         """
-        client = None
-        if configname not in cls.clients or recreate:
-            client = AXLClient(configname)
-        return cls.clients.setdefault(configname, client)
+        obj.__client__ = cls.get_client(configname)
+        bound = getattr(cls.local, 'bound', dict()).get(configname)
+        if bound:
+            bound[-1].append(obj)
+
+    @classmethod
+    def get_pool(cls, configname='default'):
+        """ return the client pool for a configuration.
+        """
+        with cls.lock:
+            if configname not in cls.pools:
+                config = pyaxl.configuration.registry.get(configname)
+                cls.pools[configname] = AXLClientPool(configname, config.pool_size)
+            return cls.pools[configname]
+
+    @classmethod
+    def checkout(cls, configname='default', timeout=None):
+        """ shortcut to check out a client from the pool of a configuration.
+        """
+        return cls.get_pool(configname).checkout(timeout)
+
+
+class AXLClientPool(object):
+    """ A pool of clients for one configuration. A suds client can't
+        be used by many threads at once, so each thread checks out its
+        own client. All clients share the parsed WSDL.
+    """
+
+    def __init__(self, configname, size):
+        self.configname = configname
+        self.size = size
+        self.created = 0
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def get(self, timeout=None):
+        """ take a client from the pool. If all clients are in use and the
+            pool is full, wait until one is given back.
+        """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if create:
+            try:
+                return AXLClient.get_client(self.configname).clone()
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+        return self.idle.get(timeout=timeout)
+
+    def put(self, client):
+        """ give a client back to the pool.
+        """
+        self.idle.put(client)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """ check out a client for the current thread. While checked out
+            AXLClient.get_client returns this client in the current thread,
+            so all objects created inside use it. Afterwards these objects
+            are bound to the shared client (or the client of an outer
+            checkout), so the client isn't used by two threads.
+        """
+        client = self.get(timeout)
+        if not hasattr(AXLClient.local, 'clients'):
+            AXLClient.local.clients = dict()
+            AXLClient.local.bound = dict()
+        stack = AXLClient.local.clients.setdefault(self.configname, list())
+        bound = AXLClient.local.bound.setdefault(self.configname, list())
+        stack.append(client)
+        bound.append(list())
+        try:
+            yield client
+        finally:
+            stack.pop()
+            objs = bound.pop()
+            for obj in objs:
+                if obj.__client__ is client:
+                    AXLClient.bind(obj, self.configname)
+            self.put(client)
 
 
 def get_cache_path(configname):
     name = '%s.cache' % configname
-    return os.path.join(os.path.dirname(pyaxl.__file__), 'cache', name)
+    return os.path.join(CACHE_PATH, name)
 
 
 def get_cache(configname):
     return ObjectCache(get_cache_path(configname))
 
 
+class SchemaBundle(ObjectCache):
+    """ Cache of the pickled and already resolved WSDL, see cachingpolicy 1
+        of suds. Loading it is much faster than parsing the WSDL and XSD
+        files. Each bundle is stored under the hash of these files, so
+        a changed schema is never loaded from an old bundle.
+
+        The elements and types of the schemas are pickled one by one into
+        an items file beside the WSDL. They are loaded when suds looks them
+        up the first time, so a client only holds the part of the API it
+        uses.
+    """
+
+    protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, *args, **kwargs):
+        super(SchemaBundle, self).__init__(*args, **kwargs)
+        self.preloaded = dict()
+
+    def preload(self, id):
+        """ load the bundle and keep it for the next get. Returns False
+            if it doesn't exist or can't be loaded, a broken bundle is
+            removed. The garbage collector is paused meanwhile, otherwise
+            it scans the growing WSDL again and again while unpickling.
+        """
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.preloaded[id] = self.load(id)
+        finally:
+            if enabled:
+                gc.enable()
+        return self.preloaded[id] is not None
+
+    def load(self, id):
+        """ load the WSDL of the bundle, the items of its schemas are
+            read from the items file on first use. A bundle without items
+            file (e.g. written by an older version) is removed.
+        """
+        bundle = super(SchemaBundle, self).get(id)
+        if bundle is None:
+            return None
+        if not isinstance(bundle, dict) or not os.path.exists(self.itemsfile(id)):
+            self.purge(id)
+            return None
+        reader = BundleReader(self.itemsfile(id), bundle['schemas'], bundle['nodes'])
+        for schema in bundle['schemas']:
+            reader.attach(schema)
+        return bundle['wsdl']
+
+    def get(self, id):
+        if id in self.preloaded:
+            return self.preloaded.pop(id)
+        return self.load(id)
+
+    def put(self, id, object):
+        try:
+            os.makedirs(self.location, exist_ok=True)
+            with open(self.itemsfile(id), 'wb') as items:
+                data = BundlePickler.bundle(object, items, self.protocol)
+            super(ObjectCache, self).put(id, data)
+        except Exception as e:
+            Logger.warning('WSDL bundle at %s could not be written: %s' % (self.location, e))
+        return object
+
+    def purge(self, id):
+        super(SchemaBundle, self).purge(id)
+        try:
+            os.remove(self.itemsfile(id))
+        except OSError:
+            pass
+
+    def itemsfile(self, id):
+        return os.path.join(self.location, '%s-%s.items' % (self.fnprefix, id))
+
+
+class BundlePickler(pickle.Pickler):
+    """ Pickler for the WSDL of a bundle and the items of its schemas.
+        Objects in states are pickled with the given state instead of
+        their own, objects in shared only by their key.
+    """
+
+    def __init__(self, file, protocol, states, shared=None):
+        super(BundlePickler, self).__init__(file, protocol)
+        self.protocol = protocol
+        self.states = states
+        self.shared = shared or dict()
+
+    def persistent_id(self, obj):
+        return self.shared.get(id(obj))
+
+    def reducer_override(self, obj):
+        state = self.states.get(id(obj))
+        if state is None:
+            if not isinstance(obj, SchemaObject) or not obj.__dict__.get('resolved_cache'):
+                return NotImplemented
+            # the resolved types are looked up again, otherwise an item
+            # would drag other items along
+            state = dict(obj.__dict__, resolved_cache=dict())
+        reduced = obj.__reduce_ex__(self.protocol)
+        return reduced[:2] + (state,) + reduced[3:]
+
+    @classmethod
+    def bundle(cls, wsdl, items, protocol):
+        """ write the items of the schemas of the WSDL to the items file
+            and return the pickled WSDL. Instead of the items the schemas
+            hold their position in the items file. An item refers to its
+            schema and to the XML nodes above it by their index.
+        """
+        schemas = [wsdl.schema]
+        for schema in schemas:
+            for kind in SCHEMA_ITEMS:
+                for item in getattr(schema, kind).values():
+                    if item.schema not in schemas:
+                        schemas.append(item.schema)
+        objs = OrderedDict()
+        for schema in schemas:
+            for kind in SCHEMA_ITEMS:
+                objs.update((id(item), item) for item in getattr(schema, kind).values())
+        roots = set(id(item.root) for item in objs.values())
+        nodes = OrderedDict()
+        for item in objs.values():
+            node = item.root.parent
+            while node is not None and id(node) not in nodes:
+                nodes[id(node)] = node
+                node = node.parent
+        shared = dict((id(schema), ('schema', index)) for index, schema in enumerate(schemas))
+        shared.update((id(node), ('node', index)) for index, node in enumerate(nodes.values()))
+        positions = dict()
+        for key, item in objs.items():
+            data = io.BytesIO()
+            cls(data, protocol, dict(), shared).dump(item)
+            positions[key] = items.tell(), len(data.getvalue())
+            items.write(data.getvalue())
+        states = dict()
+        for schema in schemas:
+            state = states[id(schema)] = dict(schema.__dict__)
+            for kind in SCHEMA_ITEMS:
+                state[kind] = dict((k, positions[id(item)]) for k, item in state[kind].items())
+            for attr in ('all', 'children'):
+                state[attr] = [positions.get(id(item), item) for item in state[attr]]
+        for node in nodes.values():
+            children = getattr(node, 'children', None)
+            if children is not None:
+                states[id(node)] = dict(node.__dict__, children=[c for c in children if id(c) not in roots])
+        data = io.BytesIO()
+        cls(data, protocol, states).dump(dict(wsdl=wsdl, schemas=schemas, nodes=list(nodes.values())))
+        return data.getvalue()
+
+
+class BundleReader(object):
+    """ Loads the items of the schemas in a bundle from the items file.
+        Each item is only loaded once, also when more than one schema
+        holds it. The file is opened for each item, an open file would
+        share its position with forked processes.
+    """
+
+    def __init__(self, path, schemas, nodes):
+        self.path = path
+        self.shared = dict(schema=schemas, node=nodes)
+        self.loaded = dict()
+        self.lock = threading.Lock()
+
+    def __deepcopy__(self, memo=None):
+        # a copied schema (e.g. in the metadata of a copied suds object)
+        # loads its items from the same file
+        return self
+
+    def attach(self, schema):
+        """ replace the positions in the schema by the items.
+        """
+        for kind in SCHEMA_ITEMS:
+            setattr(schema, kind, BundledItems(self, getattr(schema, kind)))
+        schema.all = BundledList(self, schema.all)
+        schema.children = BundledList(self, schema.children)
+
+    def load(self, position):
+        with self.lock:
+            item = self.loaded.get(position)
+            if item is None:
+                offset, length = position
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read(length)
+                unpickler = pickle.Unpickler(io.BytesIO(data))
+                unpickler.persistent_load = self.persistent_load
+                item = self.loaded[position] = unpickler.load()
+            return item
+
+    def persistent_load(self, pid):
+        kind, index = pid
+        return self.shared[kind][index]
+
+
+class BundledItems(Mapping):
+    """ The elements, types, ... of a schema in a bundle, loaded when
+        they're looked up.
+    """
+
+    def __init__(self, reader, positions):
+        self.reader = reader
+        self.positions = positions
+
+    def __getitem__(self, key):
+        return self.reader.load(self.positions[key])
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class BundledList(Sequence):
+    """ The children of a schema in a bundle, the items among them are
+        loaded when they're used.
+    """
+
+    def __init__(self, reader, entries):
+        self.reader = reader
+        self.entries = entries
+
+    def __getitem__(self, index):
+        entry = self.entries[index]
+        if isinstance(entry, tuple):
+            return self.reader.load(entry)
+        return entry
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def get_bundle(configname, digest):
+    return SchemaBundle(os.path.join(get_cache_path(configname), '%s-%s' % (BUNDLE, digest)))
+
+
+def bundle_id(url):
+    """ id of the WSDL in a bundle, the same as suds uses.
+    """
+    return Reader.mangle(None, url, 'wsdl')
+
+
+def get_bundle_digest(configname, urls):
+    """ return the hash of the WSDL and XSD files. If the files are not
+        available anymore the hash written by pyaxl_import_wsdl is used
+        as long as the bundle exists. None means no bundle can be used.
+    """
+    paths = [url2pathname(urlsplit(url).path) for url in urls]
+    if all(os.path.exists(path) for path in paths):
+        return schema_digest(paths)
+    path = os.path.join(get_cache_path(configname), BUNDLE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        digest = f.read().strip()
+    if not os.path.isdir(get_bundle(configname, digest).location):
+        return None
+    return digest
+
+
+def schema_digest(paths):
+    """ hash over the content of the schema files.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
 def import_wsdl():
     parser = argparse.ArgumentParser(description='''Import Cisco's WSDL. The WSDL must be in a
                                                     directory with the version as his name. All
@@ -167,6 +716,16 @@ def import_wsdl():
             f.write('%s\n' % imp.ns)
         f.close()
 
+    urls = [client.wsdl.url] + [imp.ns for imp in doctor.imports]
+    digest = schema_digest([url2pathname(urlsplit(url).path) for url in urls])
+    bundle = get_bundle(args.configname, digest)
+    # the client has registered the namespace prefixes (ns0, ...) in
+    # the WSDL, the bundle keeps them
+    bundle.put(bundle_id(client.wsdl.url), client.wsdl)
+    with open(os.path.join(cache.location, BUNDLE), 'w') as f:
+        f.write('%s\n' % digest)
+    print('WSDL bundle written to %s' % bundle.location)
+
 
 def normpath(path):
     """ Replace On Windows back slash to forward slash
@@ -1,9 +1,24 @@
+import re
+import time
 import logging
+from suds import WebFault
+from suds.transport import TransportError
 from pyaxl import utils
+from pyaxl import fastparse
+from pyaxl import ratelimit
+from pyaxl import exceptions
 from pyaxl.axlhandler import AXLClient
 
 log = logging.getLogger('pyaxl')
 
+IN_CHUNKSIZE = 200
+PAGESIZE = 2000
+MIN_PAGESIZE = 50
+RETRIES = 5
+RETRY_WAIT = 1
+REGEX_ROW_FETCH = re.compile(r'less than (\d+) rows', re.I)
+TOO_LARGE_FAULT = 'query request too large'
+
 
 class AXLSQL(object):
 
@@ -12,11 +27,18 @@ class AXLSQL(object):
 
     def _exec(self, sql):
         log.info('Execute SqlQuery "%s"' % sql)
-        return self.client.service.executeSQLQuery(sql)
+        return self.client.operation('executeSQLQuery')(sql)
+
+    def _execrows(self, sql):
+        """ same as _exec, but the reply is streamed by pyaxl.fastparse
+            and the rows are returned as dicts with str values.
+        """
+        log.info('Execute SqlQuery "%s"' % sql)
+        return fastparse.iter_rows(fastparse.send(self.client, 'executeSQLQuery', sql))
 
     def _execupdate(self, sql):
         log.info('Execute SqlUpdate "%s"' % sql)
-        return self.client.service.executeSQLUpdate(sql)
+        return self.client.operation('executeSQLUpdate')(sql)
 
     def _genresult(self, dom_or_part, ispart=False):
         if not ispart:
@@ -36,6 +58,110 @@ class AXLSQL(object):
         for part in dom['return']['row']:
             yield self._genresult(part, True)
 
+    def _exec_in(self, sql, values, chunksize=None):
+        """ execute a query for many uuids. sql must contain
+            "IN (%(values)s)", it's sent once for each chunk of uuids
+            to stay below the size limit of a query. Returns a
+            generator over all rows.
+        """
+        values = list(dict.fromkeys(utils.uuid(v) for v in values))
+        chunksize = chunksize or IN_CHUNKSIZE
+        for i in range(0, len(values), chunksize):
+            chunk = ', '.join(['"%s"' % v for v in values[i:i + chunksize]])
+            for row in self._execrows(sql % dict(values=chunk)):
+                yield row
+
+    def _execupdate_in(self, sql, values, chunksize=None):
+        """ same as _exec_in for updates, returns the number of
+            updated rows.
+        """
+        values = list(dict.fromkeys(utils.uuid(v) for v in values))
+        chunksize = chunksize or IN_CHUNKSIZE
+        updated = 0
+        for i in range(0, len(values), chunksize):
+            chunk = ', '.join(['"%s"' % v for v in values[i:i + chunksize]])
+            result = self._execupdate(sql % dict(values=chunk))
+            updated += int(result['return']['rowsUpdated'])
+        return updated
+
+    def _mapresultlist(self, rows, key, values):
+        """ map the rows to the uuid in the column key. Each of the
+            given uuids is in the mapping, also without rows.
+        """
+        mapping = utils.UUIDDict([(utils.uuid(v), list()) for v in values])
+        for row in rows:
+            mapping.setdefault(row[key], list()).append(row)
+        return mapping
+
+    def _mapresult(self, rows, key, values):
+        """ same as _mapresultlist but for queries with at most one row
+            per uuid. Uuids without a row are mapped to None.
+        """
+        mapping = utils.UUIDDict([(utils.uuid(v), None) for v in values])
+        for row in rows:
+            if mapping.get(row[key]) is not None:
+                raise ValueError('too many results.')
+            mapping[row[key]] = row
+        return mapping
+
+    def query(self, columns, sql, pagesize=None):
+        """ execute a big query page by page and return a generator
+            over the rows as tuples with the values of columns.
+            sql is the part after the columns, it should have an "ORDER BY"
+            so the pages are stable, e.g.:
+
+                query(('pkid', 'name'), 'FROM device ORDER BY pkid')
+
+            Each page is fetched with "SELECT SKIP n FIRST m". If callmanager
+            is throttling or the page is too large, the page size is reduced
+            and the page is requested again. Afterwards it grows slowly
+            back to pagesize.
+        """
+        maxsize = size = pagesize or PAGESIZE
+        select = ', '.join(columns)
+        skip = 0
+        while True:
+            size, rows = self._exec_page(select, sql, skip, size)
+            count = 0
+            for row in rows:
+                count += 1
+                yield tuple([row.get(c) for c in columns])
+            if count < size:
+                return
+            skip += count
+            size = min(maxsize, size + max(maxsize // 10, 1))
+
+    def _exec_page(self, select, sql, skip, size):
+        """ execute one page of a paged query. Returns the used page size
+            and a generator over the rows.
+        """
+        retries = 0
+        while True:
+            try:
+                return size, self._execrows('SELECT SKIP %s FIRST %s %s %s' % (skip, size, select, sql))
+            except (WebFault, TransportError) as e:
+                if not self._throttled(e):
+                    raise
+                if retries >= RETRIES:
+                    raise exceptions.ThrottledException('query was throttled %s times: %s' % (retries, e))
+                retries += 1
+                suggested = REGEX_ROW_FETCH.search(str(e))
+                if suggested is not None:
+                    reduced = min(size, int(suggested.group(1)) - 1)
+                else:
+                    reduced = size // 2
+                size = max(min(MIN_PAGESIZE, size), reduced)
+                log.warning('query was throttled, retry with page size %s' % size)
+                time.sleep(RETRY_WAIT * retries)
+
+    def _throttled(self, error):
+        """ check if callmanager refused a query because of its limits
+            or because the page is too large.
+        """
+        if isinstance(error, TransportError):
+            return error.httpcode == 503
+        return ratelimit.throttled(str(error)) or TOO_LARGE_FAULT in str(error).lower()
+
     def _tobool(self, value):
         return 't' if bool(value) else 'f'
 
@@ -46,10 +172,26 @@ class AXLSQLUtils(AXLSQL):
         sql = 'SELECT * FROM extensionmobilitydynamic WHERE fkenduser="%(fkenduser)s"'
         return self._genresultlist(self._exec(sql % dict(fkenduser=utils.uuid(fkenduser))))
 
+    def user_phone_association_many(self, fkendusers, chunksize=None):
+        """ same as user_phone_association for many users, returns
+            a mapping from uuid to a list of rows.
+        """
+        fkendusers = list(fkendusers)
+        sql = 'SELECT * FROM extensionmobilitydynamic WHERE fkenduser IN (%(values)s)'
+        return self._mapresultlist(self._exec_in(sql, fkendusers, chunksize), 'fkenduser', fkendusers)
+
     def has_cups_cupc(self, fkenduser):
         sql = 'SELECT * FROM enduserlicense WHERE fkenduser="%(fkenduser)s"'
         return self._genresult(self._exec(sql % dict(fkenduser=utils.uuid(fkenduser))))
 
+    def has_cups_cupc_many(self, fkendusers, chunksize=None):
+        """ same as has_cups_cupc for many users, returns a mapping
+            from uuid to the row or None.
+        """
+        fkendusers = list(fkendusers)
+        sql = 'SELECT * FROM enduserlicense WHERE fkenduser IN (%(values)s)'
+        return self._mapresult(self._exec_in(sql, fkendusers, chunksize), 'fkenduser', fkendusers)
+
     def insert_cups(self, fkenduser, cupc):
         sql = 'INSERT INTO enduserlicense (fkenduser, enablecups, enablecupc) VALUES ("%(fkenduser)s", "t", "%(cupc)s")'
         self._execupdate(sql % dict(fkenduser=utils.uuid(fkenduser), cupc=self._tobool(cupc)))
@@ -62,14 +204,46 @@ class AXLSQLUtils(AXLSQL):
         sql = 'UPDATE enduserlicense SET enablecupc = "%(cupc)s" WHERE fkenduser = "%(fkenduser)s"'
         self._execupdate(sql % dict(fkenduser=utils.uuid(fkenduser), cupc=self._tobool(cupc)))
 
+    def remove_cups_many(self, fkendusers, chunksize=None):
+        sql = 'DELETE FROM enduserlicense WHERE fkenduser IN (%(values)s)'
+        return self._execupdate_in(sql, fkendusers, chunksize)
+
+    def update_cups_many(self, fkendusers, cupc, chunksize=None):
+        sql = 'UPDATE enduserlicense SET enablecupc = "%(cupc)s" WHERE fkenduser IN (%%(values)s)'
+        return self._execupdate_in(sql % dict(cupc=self._tobool(cupc)), fkendusers, chunksize)
+
     def update_bfcp(self, fkenduser, bfcp):
         sql = 'UPDATE device SET enablebfcp = "%(bfcp)s" WHERE pkid = "%(fkenduser)s"'
         self._execupdate(sql % dict(fkenduser=utils.uuid(fkenduser), bfcp=self._tobool(bfcp)))
 
+    def update_bfcp_many(self, fkdevices, bfcp, chunksize=None):
+        sql = 'UPDATE device SET enablebfcp = "%(bfcp)s" WHERE pkid IN (%%(values)s)'
+        return self._execupdate_in(sql % dict(bfcp=self._tobool(bfcp)), fkdevices, chunksize)
+
+    def get_bfcp_many(self, fkdevices, chunksize=None):
+        """ returns a mapping from the uuid of a device to the row
+            with enablebfcp or None.
+        """
+        fkdevices = list(fkdevices)
+        sql = 'SELECT pkid, enablebfcp FROM device WHERE pkid IN (%(values)s)'
+        return self._mapresult(self._exec_in(sql, fkdevices, chunksize), 'pkid', fkdevices)
+
     def set_single_number_reach(self, fkremotedestination, value):
         sql = 'UPDATE remotedestinationdynamic SET enablesinglenumberreach = "%(value)s" WHERE fkremotedestination = "%(fkremotedestination)s"'
         self._execupdate(sql % dict(fkremotedestination=utils.uuid(fkremotedestination), value=self._tobool(value)))
 
+    def set_single_number_reach_many(self, fkremotedestinations, value, chunksize=None):
+        sql = 'UPDATE remotedestinationdynamic SET enablesinglenumberreach = "%(value)s" WHERE fkremotedestination IN (%%(values)s)'
+        return self._execupdate_in(sql % dict(value=self._tobool(value)), fkremotedestinations, chunksize)
+
     def get_single_number_reach(self, fkremotedestination):
         sql = 'SELECT enablesinglenumberreach FROM remotedestinationdynamic WHERE fkremotedestination = "%(fkremotedestination)s"'
         return self._genresult(self._exec(sql % dict(fkremotedestination=utils.uuid(fkremotedestination))))
+
+    def get_single_number_reach_many(self, fkremotedestinations, chunksize=None):
+        """ same as get_single_number_reach for many remote destinations,
+            returns a mapping from uuid to the row or None.
+        """
+        fkremotedestinations = list(fkremotedestinations)
+        sql = 'SELECT fkremotedestination, enablesinglenumberreach FROM remotedestinationdynamic WHERE fkremotedestination IN (%(values)s)'
+        return self._mapresult(self._exec_in(sql, fkremotedestinations, chunksize), 'fkremotedestination', fkremotedestinations)
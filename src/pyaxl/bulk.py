@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from collections import namedtuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from suds import WebFault
+from suds.transport import TransportError
+
+from pyaxl import ratelimit
+from pyaxl import exceptions
+
+
+log = logging.getLogger('pyaxl')
+
+WORKERS = 4
+RETRIES = 3
+BACKOFF = 1
+ACTIONS = ('create', 'update', 'remove')
+# actions which callmanager may have done even if the request failed
+UNSAFE_ACTIONS = ('create', 'remove')
+TRANSIENT_HTTPCODES = (502, 503, 504)
+REFUSED_HTTPCODES = (503,)
+NOT_FOUND_FAULT = 'was not found'
+# objects with a lower rank are created first and removed last.
+RANKS = dict(RoutePartition=1,
+             Css=2,
+             Line=3,
+             DeviceProfile=4,
+             Phone=4,
+             CtiRoutingPoint=4,
+             RemoteDestinationProfile=4,
+             LineGroup=4,
+             User=5,
+             AppUser=5,
+             HuntList=5,
+             RemoteDestination=6,
+             HuntPilot=6)
+KEY_ATTRIBUTES = ('name', 'userid', 'pattern')
+
+BulkResult = namedtuple('BulkResult', ('key', 'action', 'status', 'uuid', 'error', 'attempts'))
+
+
+class BulkOperation(object):
+
+    def __init__(self, key, action, obj, rank):
+        self.key = key
+        self.action = action
+        self.obj = obj
+        self.rank = rank
+
+    @property
+    def order(self):
+        """ removes are done before all other operations and in the
+            reverse order of the ranks.
+        """
+        if self.action == 'remove':
+            return 0, -self.rank
+        return 1, self.rank
+
+
+class BulkExecutor(object):
+    """ Create, update and remove many objects. The operations are
+        grouped by the rank of their type (e.g. lines before phones
+        before users), the operations of one rank are done concurrently
+        by workers with clients from the pool. Transient errors are
+        retried with an exponential backoff. A create or remove which
+        maybe reached callmanager (e.g. a lost connection) is only
+        retried if the object wasn't created or removed meanwhile.
+
+        With a journal every finished operation is written to a file
+        (json lines). When the executor is run again with the same
+        journal, operations that are already done are skipped.
+    """
+
+    def __init__(self, workers=WORKERS, journal=None, retries=RETRIES,
+                 backoff=BACKOFF, stop_on_error=True):
+        self.workers = workers
+        self.journal = journal is not None and Journal(journal) or None
+        self.retries = retries
+        self.backoff = backoff
+        self.stop_on_error = stop_on_error
+        self.operations = OrderedDict()
+
+    def create(self, obj, key=None, rank=None):
+        return self.add('create', obj, key, rank)
+
+    def update(self, obj, key=None, rank=None):
+        return self.add('update', obj, key, rank)
+
+    def remove(self, obj, key=None, rank=None):
+        return self.add('remove', obj, key, rank)
+
+    def add(self, action, obj, key=None, rank=None):
+        """ add an operation and return its key. The key identifies the
+            operation in the journal, so it must be the same for each run.
+            Without a key it is built of the action, the type and the
+            name of the object.
+        """
+        if action not in ACTIONS:
+            raise ValueError('unknown action "%s"' % action)
+        if key is None:
+            key = self._key(action, obj)
+        if key in self.operations:
+            raise ValueError('operation "%s" was already added' % key)
+        if rank is None:
+            rank = RANKS.get(obj.__class__.__name__, 0)
+        self.operations[key] = BulkOperation(key, action, obj, rank)
+        return key
+
+    def run(self):
+        """ run all operations and return a BulkResult for each of them
+            in the order they were added. If stop_on_error is set and an
+            operation failed, the operations of the following ranks are
+            cancelled.
+        """
+        done = self.journal is not None and self.journal.load() or dict()
+        results = dict()
+        failed = False
+        for order, operations in self._ranks():
+            if failed and self.stop_on_error:
+                for op in operations:
+                    results[op.key] = BulkResult(op.key, op.action, 'cancelled', None, None, 0)
+                continue
+            pending = list()
+            for op in operations:
+                if op.key in done:
+                    results[op.key] = self._skip(op, done[op.key])
+                else:
+                    pending.append(op)
+            log.info('bulk rank %s: %s operations, %s already done' % (
+                op.rank, len(pending), len(operations) - len(pending)))
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for result in executor.map(self._execute, pending):
+                    results[result.key] = result
+                    failed = failed or result.status == 'failed'
+        return [results[key] for key in self.operations]
+
+    def _ranks(self):
+        ranks = OrderedDict()
+        for op in sorted(self.operations.values(), key=lambda op: op.order):
+            ranks.setdefault(op.order, list()).append(op)
+        return ranks.items()
+
+    def _key(self, action, obj):
+        if action != 'create' and obj.__attached__:
+            return '%s %s %s' % (action, obj.__class__.__name__, obj._uuid)
+        for name in KEY_ATTRIBUTES:
+            value = getattr(obj, name, None)
+            if value:
+                return '%s %s %s' % (action, obj.__class__.__name__, value)
+        raise ValueError('a key is needed for %s' % obj.__class__.__name__)
+
+    def _skip(self, op, entry):
+        """ an operation which is already done by a previous run. A
+            created object gets the uuid from the journal.
+        """
+        if op.action == 'create' and entry.get('uuid') is not None:
+            op.obj._uuid = entry['uuid']
+            op.obj.__attached__ = True
+        log.debug('%s is already done' % op.key)
+        return BulkResult(op.key, op.action, 'skipped', entry.get('uuid'), None, 0)
+
+    def _execute(self, op):
+        attempts = 0
+        unsure = False
+        while True:
+            attempts += 1
+            checking = unsure
+            try:
+                if not checking or not self._applied(op):
+                    checking = False
+                    op.obj._call_pooled(getattr(op.obj, op.action))
+            except Exception as e:
+                if attempts <= self.retries and self._retryable(op, e):
+                    unsure = op.action in UNSAFE_ACTIONS and (checking or not refused(e))
+                    wait = self.backoff * 2 ** (attempts - 1)
+                    log.warning('%s failed, retry in %ss: %s' % (op.key, wait, e))
+                    time.sleep(wait)
+                    continue
+                log.error('%s failed: %s' % (op.key, e))
+                result = BulkResult(op.key, op.action, 'failed', None, str(e), attempts)
+                break
+            uuid = op.action != 'remove' and op.obj._uuid or None
+            result = BulkResult(op.key, op.action, 'done', uuid, None, attempts)
+            break
+        if self.journal is not None:
+            self.journal.write(result)
+        return result
+
+    def _retryable(self, op, error):
+        """ a create is only retried if the object can be looked up,
+            to check if the failed request was done anyway.
+        """
+        if not transient(error):
+            return False
+        return op.action != 'create' or refused(error) or self._criteria(op.obj) is not None
+
+    def _criteria(self, obj):
+        """ return the criteria to get an object which is created or
+            None if it has no key attribute.
+        """
+        for name in KEY_ATTRIBUTES:
+            value = getattr(obj, name, None)
+            if value:
+                criteria = {name: value}
+                if name == 'pattern' and getattr(obj, 'routePartitionName', None):
+                    criteria['routePartitionName'] = obj.routePartitionName
+                return criteria
+        return None
+
+    def _applied(self, op):
+        """ check if callmanager did a create or remove whose request
+            failed. If so, the object is updated like after a successful
+            request.
+        """
+        obj = op.obj
+        if op.action == 'create':
+            uuid = self._lookup(obj, self._criteria(obj))
+            if uuid is None:
+                return False
+            obj._uuid = uuid
+            obj.__attached__ = True
+            obj._snapshot()
+        else:
+            if self._lookup(obj, dict(uuid=obj._uuid)) is not None:
+                return False
+            obj._invalidate()
+            obj._uuid = None
+            obj.__attached__ = False
+        log.info('%s was already done by callmanager' % op.key)
+        return True
+
+    def _lookup(self, obj, criteria):
+        """ return the uuid of the object matching the criteria in
+            callmanager or None if it doesn't exist.
+        """
+        found = obj.__class__(configname=obj.__configname__)
+        try:
+            found._call_pooled(found._load, list(), criteria, cached=False)
+        except WebFault as e:
+            if NOT_FOUND_FAULT in str(e):
+                return None
+            raise
+        return found._uuid
+
+
+class Journal(object):
+    """ File with one json line for each finished operation of a
+        BulkExecutor. Lines are flushed to disk immediately, so the
+        journal is complete even if the process is killed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self):
+        """ return the entries of all operations that are done.
+        """
+        done = dict()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line of a killed process may be incomplete
+                    log.warning('skip broken line in journal %s' % self.path)
+                    continue
+                if entry.get('status') == 'done':
+                    done[entry['key']] = entry
+        return done
+
+    def write(self, result):
+        entry = result._asdict()
+        entry['time'] = time.time()
+        line = json.dumps(entry) + '\n'
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def refused(error):
+    """ check if callmanager refused a request without doing it, so
+        also a create or remove can be sent again.
+    """
+    if isinstance(error, exceptions.ThrottledException):
+        return True
+    if isinstance(error, TransportError):
+        return error.httpcode in REFUSED_HTTPCODES
+    if type(error) is Exception and error.args and isinstance(error.args[0], tuple):
+        return error.args[0][0] in REFUSED_HTTPCODES
+    if isinstance(error, WebFault):
+        return ratelimit.throttled(str(error))
+    return False
+
+
+def transient(error):
+    """ check if an error is temporary, e.g. callmanager is
+        overloaded or the connection was lost.
+    """
+    if isinstance(error, exceptions.ThrottledException):
+        return True
+    if isinstance(error, TransportError):
+        return error.httpcode in TRANSIENT_HTTPCODES
+    if type(error) is Exception and error.args and isinstance(error.args[0], tuple):
+        # suds raises the http status and reason as Exception((status, reason))
+        return error.args[0][0] in TRANSIENT_HTTPCODES
+    if isinstance(error, (ConnectionError, socket.timeout, URLError)):
+        return True
+    if isinstance(error, WebFault):
+        return ratelimit.throttled(str(error))
+    return False
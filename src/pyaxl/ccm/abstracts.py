@@ -1,11 +1,16 @@
 import pyaxl
 import logging
 from copy import copy
-from suds.sax.text import Text
+from concurrent.futures import ThreadPoolExecutor
 from suds.sudsobject import Object
 
+from pyaxl import aio
+from pyaxl import utils
+from pyaxl import fastparse
 from pyaxl import exceptions
+from pyaxl.ccm import compact
 from pyaxl.axlhandler import AXLClient
+from pyaxl.objectcache import ObjectCache
 
 
 PF_LIST = 'list'
@@ -15,10 +20,17 @@ PF_ADD = 'add'
 PF_REMOVE = 'remove'
 XSD_NS = 'ns0'
 ESCAPES = dict(cls='class')
+CHUNKSIZE = 1000
+WORKERS = 4
+MISSING = object()
 
 log = logging.getLogger('pyaxl')
 
 
+def first_lower(s):
+    return s[:1].lower() + s[1:] if s else ''
+
+
 class BaseCCModel(Object):
     """ Provide base functionality for Abstract
         or XTypes Objects.
@@ -29,7 +41,9 @@ class BaseCCModel(Object):
     __config__ = None
     __client__ = None
     __attached__ = False
-    __updateable__ = list()
+    __snapshot__ = None
+    __partial__ = False
+    __lazy__ = None
 
     def __init__(self, *args, **kwargs):
         """ if no arguments are given this object will be created as
@@ -40,22 +54,49 @@ class BaseCCModel(Object):
         if 'configname' in kwargs:
             configname = kwargs['configname']
             del kwargs['configname']
+        returns = None
+        if 'returns' in kwargs:
+            returns = kwargs['returns']
+            del kwargs['returns']
+        lazy = False
+        if 'lazy' in kwargs:
+            lazy = kwargs['lazy']
+            del kwargs['lazy']
         self._configure(configname)
-        self._initalize(args, kwargs)
-
-    def __setattr__(self, name, value):
-        """ remember which attributes was changed. Generally used for
-            the update method.
+        if lazy and (args or kwargs):
+            self._defer(args, kwargs, returns)
+        else:
+            self._initalize(args, kwargs, returns)
+
+    def __getattr__(self, name):
+        """ a lazy object is loaded on the first access of an attribute.
+            A partially loaded object (see returns of _load) fetches the
+            missing fields on the first access of one of them.
         """
-        if hasattr(self, '__keylist__') and name in self.__keylist__:
-            self.__updateable__.append(name)
-        super(BaseCCModel, self).__setattr__(name, value)
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+        if self.__lazy__ is not None:
+            self.resolve()
+            return getattr(self, name)
+        if name.startswith('_') or not self.__partial__:
+            raise AttributeError(name)
+        self._load_missing()
+        return getattr(self, name)
 
     @classmethod
     def _axl_method(cls, prefix, name, client):
         """ return a function to call the callmanager.
         """
-        return getattr(client.service, '%s%s' % (prefix, name,))
+        return client.operation('%s%s' % (prefix, name,))
+
+    @classmethod
+    def _returned_tags(cls, returns):
+        """ returnedTags for a get request, returns is a list of the
+            attributes or a dict for nested tags.
+        """
+        if isinstance(returns, dict):
+            return returns
+        return dict([(i, '') for i in returns])
 
     @classmethod
     def _prepare_result(cls, result, returns):
@@ -68,31 +109,123 @@ class BaseCCModel(Object):
         for obj in unwrapped:
             yield tuple([getattr(obj, r) for r in returns])
 
-    def _initalize(self, args, kwargs):
+    def _initalize(self, args, kwargs, returns=None):
         """ a part of init method. If some search criteria was found it
             will automatically load this object.
         """
         if not args and not kwargs:
             self._create_empty()
             return
-        self._load(args, kwargs)
+        self._load(args, kwargs, returns=returns)
 
-    def _load(self, args, kwargs):
-        """ call the callmanager and load the required object.
+    def _defer(self, args, kwargs, returns=None):
+        """ remember the search criteria of a lazy object instead of
+            loading it. A lazy object with a uuid can be updated and
+            removed without being loaded.
+        """
+        Object.__init__(self)
+        self.__lazy__ = args, kwargs, returns
+        self.__attached__ = True
+        if 'uuid' in kwargs:
+            self._uuid = kwargs['uuid']
+            self._snapshot()
+
+    def resolve(self):
+        """ load a lazy object now. Attributes which were already set
+            are kept as changes.
+        """
+        if self.__lazy__ is None:
+            return
+        args, kwargs, returns = self.__lazy__
+        changed = dict([(k, self.__dict__[k]) for k in self.__keylist__ if k != '_uuid'])
+        self.__lazy__ = None
+        self.__attached__ = False
+        try:
+            self._load(args, kwargs, returns=returns)
+        except Exception:
+            self.__lazy__ = args, kwargs, returns
+            self.__attached__ = True
+            raise
+        for key, value in changed.items():
+            setattr(self, key, value)
+        log.debug('lazy %s was loaded, uuid=%s' % (self.__name__, self._uuid,))
+
+    def _load(self, args, kwargs, cached=True, returns=None):
+        """ call the callmanager and load the required object. If the
+            object cache is enabled, the object is taken from there.
+            Without cached the object is always loaded and the cache
+            is refreshed.
+
+            With returns only these attributes are requested (returnedTags),
+            the other ones are fetched on the first access. If the object
+            is already loaded, the returned attributes are refreshed.
+            A lazy object is loaded by it.
         """
-        first_lower = lambda s: s[:1].lower() + s[1:] if s else ''
+        cache = ObjectCache.get_cache(self.__configname__)
+        key = None
+        if cache is not None:
+            key = cache.key(self.__name__, args, kwargs)
+        if key is not None and cached:
+            result = cache.get(key)
+            if result is not None:
+                self._loadattr(result)
+                self._snapshot()
+                self.__attached__ = True
+                self.__lazy__ = None
+                return
+        if returns is not None:
+            kwargs = dict(kwargs, returnedTags=self._returned_tags(returns))
         method = self._axl_method(PF_GET, self.__name__, self.__client__)
         result = method(*args, **kwargs)
         result = getattr(getattr(result, 'return'), first_lower(self.__name__))
+        if returns is not None and self.__attached__ and self.__lazy__ is None:
+            self._mergeattr(result)
+            self._snapshot(result.__keylist__)
+            return
+        if key is not None and returns is None:
+            cache.put(key, result._uuid, result)
         self._loadattr(result)
+        self._snapshot()
         self.__attached__ = True
+        self.__lazy__ = None
+        self.__partial__ = returns is not None
+
+    def _load_missing(self):
+        """ fetch the attributes which are missing in a partially
+            loaded object. Changed attributes are kept.
+        """
+        self.__partial__ = False
+        method = self._axl_method(PF_GET, self.__name__, self.__client__)
+        try:
+            result = method(uuid=self._uuid)
+        except Exception:
+            self.__partial__ = True
+            raise
+        result = getattr(getattr(result, 'return'), first_lower(self.__name__))
+        missing = [k for k in result.__keylist__ if k not in self.__keylist__]
+        self._mergeattr(result, missing)
+        self._snapshot(missing)
+        log.debug('missing attributes of %s was loaded, uuid=%s' % (self.__name__, self._uuid,))
+
+    def compact(self):
+        """ return this object as compact read-only model, see pyaxl.ccm.compact.
+        """
+        self.resolve()
+        return compact.pack(self, self.__class__, self.__configname__)
+
+    def _invalidate(self):
+        """ remove this object from the object cache.
+        """
+        cache = ObjectCache.get_cache(self.__configname__)
+        if cache is not None:
+            cache.invalidate(self.__name__, self._uuid)
 
     def _convert_ecaped(self, kw):
         """ convert tags like "cls" to "class". This is normally
             done by suds, but by creating or update an object
             the attribute are not converted. This function will fix it.
         """
-        for key, value in kw.items():
+        for key, value in list(kw.items()):
             if key in ESCAPES:
                 del kw[key]
                 kw[ESCAPES[key]] = value
@@ -100,32 +233,75 @@ class BaseCCModel(Object):
 
     def _skip_empty_tags(self, obj):
         """ callmanager can't handle attributes that are empty.
-            This will recursive create a copy of object and remove
-            all empty tags.
-        """
-        copyobj = copy(obj)
-        keylist = list()
-        for key in obj.__keylist__:
-            value = getattr(obj, key)
-            if isinstance(value, list):
-                copyobj[key] = [i if isinstance(i, Text) else self._skip_empty_tags(i) for i in value]
-                keylist.append(key)
-            elif isinstance(value, Object):
-                copyobj[key] = self._skip_empty_tags(value)
-                keylist.append(key)
-            else:
-                if isinstance(value, Text) and value != '' and value is not None:
-                    keylist.append(key)
-                else:
-                    del copyobj.__dict__[key]
-        copyobj.__keylist__ = keylist
-        return copyobj
+            This will recursive create a new object (or dict) with
+            only the tags that are not empty. It's done in one pass,
+            the values, the metadata and the printer are not copied.
+        """
+        if isinstance(obj, dict):
+            items, keylist = obj, obj.keys()
+        else:
+            items, keylist = obj.__dict__, obj.__keylist__
+        pruned = dict()
+        for key in keylist:
+            value = items[key]
+            if isinstance(value, (Object, dict)):
+                pruned[key] = self._skip_empty_tags(value)
+            elif isinstance(value, list):
+                pruned[key] = [self._skip_empty_tags(i) if isinstance(i, (Object, dict)) else i
+                               for i in value if i is not None and i != '']
+            elif value is not None and value != '':
+                pruned[key] = value
+        if isinstance(obj, dict):
+            return pruned
+        prunedobj = obj.__class__.__new__(obj.__class__)
+        prunedobj.__dict__.update(pruned)
+        prunedobj.__dict__['__keylist__'] = list(pruned)
+        prunedobj.__dict__['__metadata__'] = obj.__metadata__
+        prunedobj.__dict__['__printer__'] = obj.__printer__
+        return prunedobj
+
+    def _snapshot(self, keys=None):
+        """ remember the values as they are on callmanager. The
+            changes for update are found by comparing with them.
+        """
+        snapshot = dict(self.__snapshot__ or dict())
+        for key in self.__keylist__ if keys is None else keys:
+            snapshot[key] = utils.plain(getattr(self, key, None))
+        self.__snapshot__ = snapshot
+
+    def _diff(self, value, snapshot):
+        """ return the changed part of a value or MISSING if nothing
+            changed. Of nested objects only the changed leaves are
+            returned, lists are always returned completely.
+        """
+        if utils.plain(value) == snapshot:
+            return MISSING
+        if isinstance(value, Object) and isinstance(snapshot, dict):
+            changed = dict()
+            for key in value.__keylist__:
+                diff = self._diff(getattr(value, key), snapshot.get(key, MISSING))
+                if diff is not MISSING:
+                    changed[key] = diff
+            return changed
+        return value
+
+    def changes(self):
+        """ return a dict with the attributes that was changed since the
+            object was loaded, created or updated.
+        """
+        snapshot = self.__snapshot__ or dict()
+        changes = dict()
+        for key in self.__keylist__:
+            diff = self._diff(getattr(self, key), snapshot.get(key, MISSING))
+            if diff is not MISSING:
+                changes[key] = diff
+        return changes
 
     def _configure(self, configname):
         """ a part of init method. If no name is given it will
             take automatically the name of the class.
         """
-        self.__client__ = AXLClient.get_client(configname)
+        AXLClient.bind(self, configname)
         self.__config__ = pyaxl.configuration.registry.get(configname)
         self.__configname__ = configname
         if self.__name__ is '':
@@ -135,9 +311,20 @@ class BaseCCModel(Object):
         """ create an empty object. All attributes are set
             from a xsd type.
         """
-        obj = self.__client__.factory.create('%s:X%s' % (XSD_NS, self.__name__,))
+        obj = self.__client__.create_empty('%s:X%s' % (XSD_NS, self.__name__,))
         self._loadattr(obj)
 
+    def _mergeattr(self, sudsinst, keys=None):
+        """ copy the attributes keys (default all) of a suds object in
+            this object, the other attributes are kept.
+        """
+        keylist = list(self.__keylist__)
+        for key in sudsinst.__keylist__ if keys is None else keys:
+            if key not in keylist:
+                keylist.append(key)
+            self.__dict__[key] = getattr(sudsinst, key)
+        self.__dict__['__keylist__'] = keylist
+
     def _loadattr(self, sudsinst):
         """ merge a suds object in this object... yes, python
             is so powerful :-O
@@ -166,14 +353,13 @@ class AbstractCCMModel(BaseCCModel):
         if self.__attached__:
             raise exceptions.CreationException('this object are already attached')
         method = self._axl_method(PF_ADD, self.__name__, self.__client__)
-        xtype = self.__client__.factory.create('%s:%s' % (XSD_NS, method.method.name))
-        xtype = xtype[1]  # take attributes from wrapper
-        tags = xtype.__keylist__ + list(ESCAPES.keys())
+        # take attributes from wrapper
+        tags = self.__client__.keylist('%s:%s' % (XSD_NS, method.method.name), 1).union(ESCAPES)
         unwrapped = dict()
         for key in self.__keylist__:
             value = getattr(self, key)
             if key in tags and value != '' and value is not None:
-                if isinstance(value, Object):
+                if isinstance(value, (Object, dict)):
                     unwrapped[key] = self._skip_empty_tags(value)
                 else:
                     unwrapped[key] = value
@@ -182,23 +368,32 @@ class AbstractCCMModel(BaseCCModel):
         uuid = result['return']
         self.__attached__ = True
         self._uuid = uuid
-        self.__updateable__ = list()
+        self._snapshot()
         log.info('new %s was created, uuid=%s' % (self.__name__, uuid,))
         return uuid
 
-    def update(self):
+    def update(self, fields=None):
         """ all attributes that was changed will be committed to the callmanager.
+            Of nested objects only the changed values are sent. If nothing was
+            changed, no request is sent. fields limits the update to the
+            given attributes.
         """
         if not self.__attached__:
             raise exceptions.UpdateException('you must create a object with "create" before update')
         method = self._axl_method(PF_UPDATE, self.__name__, self.__client__)
-        xtype = self.__client__.factory.create('%s:%s' % (XSD_NS, method.method.name))
-        tags = xtype.__keylist__ + list(ESCAPES.keys())
-        unwrapped = dict([(i, getattr(self, i),) for i in self.__updateable__ if i in tags])
+        tags = self.__client__.keylist('%s:%s' % (XSD_NS, method.method.name)).union(ESCAPES)
+        changes = self.changes()
+        if fields is not None:
+            changes = dict([(k, v) for k, v in changes.items() if k in fields])
+        unwrapped = dict([(k, v) for k, v in changes.items() if k in tags])
+        if not unwrapped:
+            log.debug('%s was not changed, uuid=%s' % (self.__name__, self._uuid,))
+            return
         unwrapped.update(dict(uuid=self._uuid))
         unwrapped = self._convert_ecaped(unwrapped)
         method(**unwrapped)
-        self.__updateable__ = list()
+        self._invalidate()
+        self._snapshot([k for k in changes if k in tags])
         log.info('%s was updated, uuid=%s' % (self.__name__, self._uuid,))
 
     def remove(self):
@@ -209,43 +404,56 @@ class AbstractCCMModel(BaseCCModel):
             raise exceptions.RemoveException(msg)
         method = self._axl_method(PF_REMOVE, self.__name__, self.__client__)
         method(uuid=self._uuid)
+        self._invalidate()
         self._uuid = None
         self.__attached__ = False
         log.info('%s was removed, uuid=%s' % (self.__name__, self._uuid,))
 
-    def reload(self, force=False):
-        """ Reload an object.
+    def reload(self, force=False, returns=None):
+        """ Reload an object. With returns only these attributes
+            are reloaded.
         """
         if not self.__attached__:
             msg = 'This object is not attached and can not reloaded from callmanager'
             raise exceptions.ReloadException(msg)
-        if not force and len(self.__updateable__):
+        if not force and self.changes():
             msg = 'Error because some field are already changed by the client. Use force or update it first.'
             raise exceptions.ReloadException(msg)
-        self._load(list(), dict(uuid=self._uuid))
+        self._load(list(), dict(uuid=self._uuid), cached=False, returns=returns)
 
     def clone(self):
         """ Clone a existing object. After cloning the new object will
             be detached. This means it can directly added to the callmanager
             with the create method.
         """
+        self.resolve()
         obj = self.__class__()
         #obj.__dict__.update(self.__dict__)
-        for i in ['__updateable__', '__keylist__', ] + self.__keylist__:
+        for i in ['__keylist__', ] + self.__keylist__:
             obj.__dict__[i] = copy(getattr(self, i))
+        obj.__snapshot__ = None
         obj._uuid = None
         obj.__attached__ = False
         log.debug('%s was cloned' % self.__name__)
         return obj
 
     @classmethod
-    def list(cls, criteria, returns, skip=None, first=None, configname='default'):
+    def list(cls, criteria, returns, skip=None, first=None, configname='default', chunksize=None, fast=False):
         """ find all object with the given search criteria. It also
             required a list with return values. The return value is a
             generator and the next call will return a tuple with the returnsValues.
+
+            If chunksize is given (or True for the default size) the result
+            will be fetched page by page, see _list_chunked.
+
+            With fast the reply is not parsed by suds but streamed with
+            pyaxl.fastparse. The values are str (or dict for nested tags).
         """
+        if chunksize:
+            if chunksize is True:
+                chunksize = CHUNKSIZE
+            return cls._list_chunked(criteria, returns, skip, first, configname, chunksize, fast)
         client = AXLClient.get_client(configname)
-        method = cls._axl_method(PF_LIST, cls.__name__, client)
         tags = dict([(i, True) for i in returns])
         log.debug('fetch list of %ss, search criteria=%s' % (cls.__name__, str(criteria)))
         args = criteria, tags
@@ -256,21 +464,210 @@ class AbstractCCMModel(BaseCCModel):
                 args = criteria, tags, skip
             else:
                 args = criteria, tags, skip, first
+        return cls._call_list(client, args, returns, fast)
+
+    @classmethod
+    def _call_list(cls, client, args, returns, fast=False):
+        """ send a list request and return a generator over the result.
+        """
+        if fast:
+            reply = fastparse.send(client, '%s%s' % (PF_LIST, cls.__name__), *args)
+            return fastparse.iter_list(reply, returns)
+        method = cls._axl_method(PF_LIST, cls.__name__, client)
         return cls._prepare_result(method(*args), returns)
 
     @classmethod
-    def list_obj(cls, criteria, skip=None, first=None, configname='default'):
+    def _list_chunked(cls, criteria, returns, skip, first, configname, chunksize, fast=False):
+        """ fetch the list in windows of chunksize rows. While the caller
+            is consuming one page, the next one is already requested in
+            the background with a client from the pool. Only one reply is
+            hold in memory at a time.
+
+            skip is the offset of the first row and first the maximum
+            number of rows for the whole result.
+        """
+        log.debug('fetch chunked list of %ss, search criteria=%s, chunksize=%s' % (cls.__name__, str(criteria), chunksize))
+        windows = cls._list_windows(skip, first, chunksize)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            window = next(windows, None)
+            future = None
+            if window is not None:
+                future = executor.submit(cls._list_page, criteria, returns, window, configname, fast)
+            while future is not None:
+                page = future.result()
+                window = next(windows, None)
+                future = None
+                if len(page) == chunksize and window is not None:
+                    future = executor.submit(cls._list_page, criteria, returns, window, configname, fast)
+                for row in page:
+                    yield row
+                del page
+
+    @classmethod
+    def _list_windows(cls, skip, first, chunksize):
+        """ generate the (skip, first) windows for a chunked list.
+        """
+        offset = start = skip or 0
+        while first is None or offset - start < first:
+            count = chunksize
+            if first is not None:
+                count = min(chunksize, first - (offset - start))
+            yield offset, count
+            offset += count
+
+    @classmethod
+    def _list_page(cls, criteria, returns, window, configname, fast=False):
+        """ fetch one page of a chunked list with a client from the pool.
+        """
+        tags = dict([(i, True) for i in returns])
+        with AXLClient.checkout(configname) as client:
+            return list(cls._call_list(client, (criteria, tags) + tuple(window), returns, fast))
+
+    @classmethod
+    def list_obj(cls, criteria, skip=None, first=None, configname='default', chunksize=None, workers=None,
+                 compact=False, returns=None):
         """ find all object with the given search criteria.
             The return value is generator. Each next call will
             fetch a new instance and return it as object.
+
+            With workers the objects are fetched concurrently, see get_many.
+            With compact the objects are returned as compact read-only
+            models, see get_compact. With returns only these attributes
+            are loaded, see _load.
+        """
+        uuids = (uuid for uuid, in cls.list(criteria, ('_uuid',), skip, first, configname, chunksize, fast=True))
+        if workers:
+            objs = cls.get_many(uuids, workers, configname, compact, returns)
+        elif compact:
+            objs = (cls.get_compact(uuid=uuid, configname=configname, returns=returns) for uuid in uuids)
+        else:
+            objs = (cls(uuid=uuid, configname=configname, returns=returns) for uuid in uuids)
+        for obj in objs:
+            yield obj
+
+    @classmethod
+    def get_many(cls, uuids, workers=WORKERS, configname='default', compact=False, returns=None):
+        """ fetch many objects by uuid. The get requests are sent by a pool
+            of workers, each with its own client. The objects are returned
+            in the same order as the uuids while the following are still
+            loading.
+        """
+        log.debug('fetch many %ss with %s workers' % (cls.__name__, workers))
+        if compact:
+            return utils.imap_ordered(lambda uuid: cls._get_compact_pooled(configname, uuid=uuid, returns=returns),
+                                      uuids, workers)
+        return utils.imap_ordered(lambda uuid: cls._get_pooled(configname, uuid=uuid, returns=returns), uuids, workers)
+
+    @classmethod
+    def resolve_many(cls, objs, workers=WORKERS):
+        """ load many lazy objects at once, e.g. the phones of
+            get_mobility_association. The get requests are sent by a
+            pool of workers like get_many. Returns the objects.
+        """
+        objs = list(objs)
+        lazy = [obj for obj in objs if obj.__lazy__ is not None]
+        log.debug('resolve %s lazy objects with %s workers' % (len(lazy), workers))
+        for obj in utils.imap_ordered(lambda obj: obj._call_pooled(obj.resolve), lazy, workers):
+            pass
+        return objs
+
+    @classmethod
+    def get_compact(cls, *args, configname='default', returns=None, **kwargs):
+        """ fetch an object as compact read-only model. The model needs
+            much less memory than a full object, nested objects and lists
+            are also compact. Use to_suds on it to change and update it.
+            With returns the model has only these attributes.
+        """
+        if returns is not None:
+            kwargs['returnedTags'] = cls._returned_tags(returns)
+        client = AXLClient.get_client(configname)
+        method = cls._axl_method(PF_GET, cls.__name__, client)
+        result = method(*args, **kwargs)
+        result = getattr(getattr(result, 'return'), first_lower(cls.__name__))
+        return compact.pack(result, cls, configname)
+
+    @classmethod
+    async def aget(cls, *args, configname='default', **kwargs):
+        """ asynchronous version to fetch an object. The request is
+            sent in a thread with a client from the pool, see pyaxl.aio.
+        """
+        return await aio.run(configname, cls._get_pooled, configname, *args, **kwargs)
+
+    async def acreate(self):
+        """ asynchronous version of create.
+        """
+        return await aio.run(self.__configname__, self._call_pooled, self.create)
+
+    async def aupdate(self):
+        """ asynchronous version of update.
+        """
+        return await aio.run(self.__configname__, self._call_pooled, self.update)
+
+    async def aremove(self):
+        """ asynchronous version of remove.
+        """
+        return await aio.run(self.__configname__, self._call_pooled, self.remove)
+
+    async def areload(self, force=False):
+        """ asynchronous version of reload.
+        """
+        return await aio.run(self.__configname__, self._call_pooled, self.reload, force)
+
+    @classmethod
+    async def alist(cls, criteria, returns, skip=None, first=None, configname='default', chunksize=True,
+                    fast=False):
+        """ asynchronous version of list, use it with "async for". The result
+            is always fetched page by page and the next page is requested
+            while the current one is consumed.
+        """
+        if chunksize is True:
+            chunksize = CHUNKSIZE
+        windows = cls._list_windows(skip, first, chunksize)
+        window = next(windows, None)
+        future = None
+        if window is not None:
+            future = aio.run(configname, cls._list_page, criteria, returns, window, configname, fast)
+        while future is not None:
+            page = await future
+            window = next(windows, None)
+            future = None
+            if len(page) == chunksize and window is not None:
+                future = aio.run(configname, cls._list_page, criteria, returns, window, configname, fast)
+            for row in page:
+                yield row
+            del page
+
+    def _call_pooled(self, func, *args, **kwargs):
+        """ call a method of this object with a client from the pool.
+        """
+        with AXLClient.checkout(self.__configname__) as client:
+            shared, self.__client__ = self.__client__, client
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.__client__ = shared
+
+    @classmethod
+    def _get_pooled(cls, configname, *args, **kwargs):
+        """ load an object with a client from the pool. Afterwards the
+            object is bound to the shared client of the configuration.
+        """
+        with AXLClient.checkout(configname):
+            obj = cls(*args, configname=configname, **kwargs)
+        obj.__client__ = AXLClient.get_client(configname)
+        return obj
+
+    @classmethod
+    def _get_compact_pooled(cls, configname, *args, **kwargs):
+        """ load a compact model with a client from the pool.
         """
-        for uuid, in cls.list(criteria, ('_uuid',), skip, first, configname):
-            yield cls(uuid=uuid)
+        with AXLClient.checkout(configname):
+            return cls.get_compact(*args, configname=configname, **kwargs)
 
 
 class AbstractXType(BaseCCModel):
 
-    def _initalize(self, args, kwargs):
+    def _initalize(self, args, kwargs, returns=None):
         """ Xtype is part of soap structure. XType will never be load directly so it's
             need to be created as empty object.
         """
@@ -280,7 +677,7 @@ class AbstractXType(BaseCCModel):
         """ create an empty object. All attributes are set
             from a xsd type.
         """
-        obj = self.__client__.factory.create('%s:%s' % (XSD_NS, self.__name__,))
+        obj = self.__client__.create_empty('%s:%s' % (XSD_NS, self.__name__,))
         self._loadattr(obj)
 
 
@@ -1,4 +1,3 @@
-from copy import copy
 from pyaxl import exceptions
 from pyaxl.axlsql import AXLSQLUtils
 from pyaxl.ccm.abstracts import AbstractCCMModel
@@ -29,17 +28,28 @@ class User(AbstractCCMModel, MixingAbstractTemplate):
             deviceprofiles = [deviceprofiles]
         self.phoneProfiles = [dict(profileName=dict(_uuid=i._uuid)) for i in deviceprofiles]
 
-    def get_mobility_association(self):
-        """ return phones that are associated with this user.
+    def get_mobility_association(self, prefetched=None, lazy=True):
+        """ return phones that are associated with this user. prefetched
+            can be the result of AXLSQLUtils.user_phone_association_many
+            to avoid a query for each user. The phones are lazy and
+            loaded on the first access, see Phone.resolve_many to load
+            them at once.
         """
         sqlutils = AXLSQLUtils(self.__configname__)
         if not self.__attached__:
             raise exceptions.NotAttachedException('User is not attached')
-        for i in sqlutils.user_phone_association(self._uuid):
-            yield Phone(uuid=i['fkdevice'])
+        if prefetched is not None and self._uuid in prefetched:
+            rows = prefetched[self._uuid]
+        else:
+            rows = sqlutils.user_phone_association(self._uuid)
+        for i in rows:
+            yield Phone(uuid=i['fkdevice'], configname=self.__configname__, lazy=lazy)
 
-    def get_cups_cupc(self):
-        cups, cupc, pkid = self._get_cups_cupc()
+    def get_cups_cupc(self, prefetched=None):
+        """ prefetched can be the result of AXLSQLUtils.has_cups_cupc_many
+            to avoid a query for each user.
+        """
+        cups, cupc, pkid = self._get_cups_cupc(prefetched)
         return cups, cupc
 
     def set_cups_cupc(self, cups, cupc):
@@ -54,11 +64,14 @@ class User(AbstractCCMModel, MixingAbstractTemplate):
         elif rcups and cups:
             sqlutils.update_cups(self._uuid, cupc)
 
-    def _get_cups_cupc(self):
+    def _get_cups_cupc(self, prefetched=None):
         sqlutils = AXLSQLUtils(self.__configname__)
         if not self.__attached__:
             raise exceptions.NotAttachedException('User is not attached')
-        re = sqlutils.has_cups_cupc(self._uuid)
+        if prefetched is not None and self._uuid in prefetched:
+            re = prefetched[self._uuid]
+        else:
+            re = sqlutils.has_cups_cupc(self._uuid)
         if re is None:
             return None, None, None
         return re['enablecups'] == 't', re['enablecupc'] == 't', re['pkid']
@@ -83,15 +96,15 @@ class Phone(AbstractCCMModel,
     def logout(self):
         if not self.__attached__:
             raise exceptions.LogoutException('Phone is not attached')
-        self.__client__.service.doDeviceLogout(dict(_uuid=self._uuid))
+        self.__client__.operation('doDeviceLogout')(dict(_uuid=self._uuid))
 
     def login(self, user, deviceProfile, duration=1):
         if not self.__attached__:
             raise exceptions.LogoutException('Phone is not attached')
-        self.__client__.service.doDeviceLogin(dict(_uuid=self._uuid),
-                                              duration,
-                                              dict(_uuid=deviceProfile._uuid),
-                                              user.userid)
+        self.__client__.operation('doDeviceLogin')(dict(_uuid=self._uuid),
+                                                   duration,
+                                                   dict(_uuid=deviceProfile._uuid),
+                                                   user.userid)
 
     def update_bfcp(self, value):
         if not self.__attached__:
@@ -101,11 +114,8 @@ class Phone(AbstractCCMModel,
 
         # only available for newer version, is this flag is not present we need to do it with sql
         if hasattr(self, 'AllowPresentationSharingUsingBfcp'):
-            clone = copy(self)
-            clone.AllowPresentationSharingUsingBfcp = value
-            clone.__updateable__ = ['AllowPresentationSharingUsingBfcp']
-            clone.update()
             self.AllowPresentationSharingUsingBfcp = value
+            self.update(['AllowPresentationSharingUsingBfcp'])
         else:
             sqlutils = AXLSQLUtils(self.__configname__)
             sqlutils.update_bfcp(self._uuid, value)
@@ -171,11 +181,18 @@ class RemoteDestination(AbstractCCMModel):
         sqlutils = AXLSQLUtils(self.__configname__)
         sqlutils.set_single_number_reach(self._uuid, value)
 
-    def get_single_number_reach(self):
+    def get_single_number_reach(self, prefetched=None):
+        """ prefetched can be the result of
+            AXLSQLUtils.get_single_number_reach_many to avoid a query
+            for each remote destination.
+        """
         if not self.__attached__:
             raise exceptions.NotAttachedException('User is not attached')
-        sqlutils = AXLSQLUtils(self.__configname__)
-        value = sqlutils.get_single_number_reach(self._uuid)
+        if prefetched is not None and self._uuid in prefetched:
+            value = prefetched[self._uuid]
+        else:
+            sqlutils = AXLSQLUtils(self.__configname__)
+            value = sqlutils.get_single_number_reach(self._uuid)
         return value['enablesinglenumberreach'] == 't'
 
 
@@ -197,13 +214,13 @@ class TimeSchedule(AbstractCCMModel):
         if not isinstance(members, list):
             members = [members]
         removeMembers = [dict(member=dict(timePeriodName=dict(_uuid=uuid))) for uuid in members]
-        self.__client__.service.updateTimeSchedule(removeMembers=removeMembers, uuid=self._uuid)
+        self.__client__.operation('updateTimeSchedule')(removeMembers=removeMembers, uuid=self._uuid)
 
     def addMembers(self, members):
         if not isinstance(members, list):
             members = [members]
         addMembers = [dict(member=dict(timePeriodName=dict(_uuid=uuid))) for uuid in members]
-        self.__client__.service.updateTimeSchedule(addMembers=addMembers, uuid=self._uuid)
+        self.__client__.operation('updateTimeSchedule')(addMembers=addMembers, uuid=self._uuid)
 
 
 class TimePeriod(AbstractCCMModel):
@@ -0,0 +1,121 @@
+import sys
+import threading
+from suds.sudsobject import Object
+from suds.sudsobject import Factory
+
+
+INTERN_MAX = 32
+
+
+class CompactObject(object):
+    """ Read-only object with the values of a suds object. The values
+        are stored in one tuple, the field names only once per class.
+        Empty values are stored as None, nested objects as compact
+        objects too and lists as tuples.
+    """
+
+    __slots__ = ('_values',)
+    __fields__ = ()
+    __typename__ = ''
+
+    def __init__(self, values):
+        self._values = values
+
+    def __iter__(self):
+        return iter(zip(self.__fields__, self._values))
+
+    def __repr__(self):
+        items = ', '.join(['%s=%r' % (k, v) for k, v in self if v is not None])
+        return '<%s %s>' % (self.__typename__, items)
+
+    def __setattr__(self, name, value):
+        if name != '_values':
+            raise AttributeError('%s is read-only, use to_suds first' % self.__typename__)
+        super(CompactObject, self).__setattr__(name, value)
+
+    def to_dict(self):
+        return dict([(k, unpack(v, dict)) for k, v in self])
+
+
+class CompactModel(CompactObject):
+    """ Read-only model of an object loaded from callmanager. Use
+        to_suds to get a full model object that can be changed and
+        updated.
+    """
+
+    __slots__ = ('_configname',)
+    __model__ = None
+
+    def __init__(self, values, configname):
+        super(CompactModel, self).__init__(values)
+        super(CompactObject, self).__setattr__('_configname', configname)
+
+    def __repr__(self):
+        return '<compact %s %s>' % (self.__model__.__name__, getattr(self, '_uuid', ''))
+
+    def to_suds(self):
+        """ return a full model object, the same as loaded with get.
+        """
+        obj = self.__model__(configname=self._configname)
+        obj._loadattr(unpack(self))
+        obj._snapshot()
+        obj.__attached__ = True
+        return obj
+
+
+classes = dict()
+lock = threading.Lock()
+
+
+def compact_class(base, typename, fields, model=None):
+    """ return the generated class for a type and its fields. Each
+        field is a property that reads from the tuple of values.
+    """
+    key = base, typename, fields, model
+    cls = classes.get(key)
+    if cls is not None:
+        return cls
+    with lock:
+        if key not in classes:
+            namespace = dict(__slots__=(), __fields__=fields, __typename__=typename, __model__=model)
+            for index, field in enumerate(fields):
+                namespace[field] = property(lambda self, index=index: self._values[index])
+            classes[key] = type('Compact%s' % typename, (base,), namespace)
+        return classes[key]
+
+
+def pack(value, model=None, configname=None):
+    """ convert a suds object into a compact object. With model the
+        result is a CompactModel for this model class.
+    """
+    if isinstance(value, Object):
+        fields = tuple([sys.intern(k) for k in value.__keylist__])
+        values = tuple([pack(getattr(value, k)) for k in fields])
+        if model is None:
+            return compact_class(CompactObject, value.__class__.__name__, fields)(values)
+        cls = compact_class(CompactModel, value.__class__.__name__, fields, model)
+        return cls(values, configname)
+    if isinstance(value, list):
+        return tuple([pack(i) for i in value])
+    if isinstance(value, str):
+        if value == '':
+            return None
+        value = str(value)
+        if len(value) <= INTERN_MAX:
+            return sys.intern(value)
+        return value
+    return value
+
+
+def unpack(value, objtype=None):
+    """ convert a compact object back into a suds object, or with
+        objtype=dict into a dict.
+    """
+    if isinstance(value, CompactObject):
+        items = dict([(k, unpack(v, objtype)) for k, v in value])
+        if objtype is dict:
+            return items
+        return Factory.object(value.__typename__, items)
+    if isinstance(value, tuple):
+        return [unpack(i, objtype) for i in value]
+    return value
@@ -0,0 +1,262 @@
+import logging
+import threading
+from copy import deepcopy
+from functools import partial
+from collections import namedtuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from suds.sudsobject import Object
+
+from pyaxl import utils
+from pyaxl import exceptions
+from pyaxl.axlsql import AXLSQLUtils
+from pyaxl.ccm.abstracts import WORKERS
+
+
+log = logging.getLogger('pyaxl')
+
+BFCP_ATTRIBUTE = 'AllowPresentationSharingUsingBfcp'
+
+ChangeSetEntry = namedtuple('ChangeSetEntry', ('description', 'undo'))
+
+
+class ChangeSet(object):
+    """ Records changes of many objects and commits them together.
+        The updates of the objects are sent concurrently by workers with
+        clients from the pool. Changes which are only possible with SQL
+        (AXLSQLUtils) are grouped by their value, so e.g. the BFCP flag of
+        100 phones is set with one "UPDATE ... WHERE pkid IN (...)".
+
+        For each committed change an entry with a compensating action is
+        written to log, which holds only the entries of the last commit. If
+        the commit fails partway, the entries are undone in reverse order
+        and a ChangeSetException is raised. The log can also be used to undo
+        the last successful commit with rollback.
+
+        Used as context manager the changes are committed at the end of
+        the block, if the block raised an exception they are discarded.
+    """
+
+    def __init__(self, configname='default', workers=WORKERS, autorollback=True):
+        self.configname = configname
+        self.workers = workers
+        self.autorollback = autorollback
+        self.log = list()
+        self.lock = threading.Lock()
+        self.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def __len__(self):
+        return len(self.updates) + len(self.cups) + len(self.bfcp) + len(self.single_number_reach)
+
+    def update(self, obj, fields=None):
+        """ record the changes of an object, fields limits them to the
+            given attributes like in update. An object is updated once
+            even if it is recorded many times.
+        """
+        if not obj.__attached__:
+            raise exceptions.UpdateException('you must create a object with "create" before update')
+        key = id(obj)
+        if key in self.updates and fields is not None:
+            recorded = self.updates[key][1]
+            fields = recorded is not None and set(recorded).union(fields) or None
+        self.updates[key] = obj, fields is not None and set(fields) or None
+
+    def set_cups_cupc(self, user, cups, cupc):
+        """ same as User.set_cups_cupc.
+        """
+        if not user.__attached__:
+            raise exceptions.NotAttachedException('User is not attached')
+        if cupc and not cups:
+            raise exceptions.PyAXLException('If cupc is true, cups must also be true')
+        self.cups[utils.uuid(user._uuid)] = bool(cups), bool(cupc)
+
+    def update_bfcp(self, phone, value):
+        """ same as Phone.update_bfcp. Without the attribute
+            AllowPresentationSharingUsingBfcp the flag is set with SQL.
+        """
+        if not phone.__attached__:
+            raise exceptions.LogoutException('Phone is not attached')
+        if not phone.protocol == 'SIP':
+            raise exceptions.PyAXLException('To change BFCP the phone must support SIP protocol')
+        if hasattr(phone, BFCP_ATTRIBUTE):
+            setattr(phone, BFCP_ATTRIBUTE, value)
+            self.update(phone, [BFCP_ATTRIBUTE])
+        else:
+            self.bfcp[utils.uuid(phone._uuid)] = bool(value)
+
+    def set_single_number_reach(self, remotedestination, value):
+        """ same as RemoteDestination.set_single_number_reach.
+        """
+        if not remotedestination.__attached__:
+            raise exceptions.NotAttachedException('User is not attached')
+        self.single_number_reach[utils.uuid(remotedestination._uuid)] = bool(value)
+
+    def discard(self):
+        """ forget all recorded changes.
+        """
+        self.updates = OrderedDict()
+        self.cups = OrderedDict()
+        self.bfcp = OrderedDict()
+        self.single_number_reach = OrderedDict()
+
+    def commit(self):
+        """ send all recorded changes to callmanager.
+        """
+        log.info('commit %s changes' % len(self))
+        self.log = list()
+        try:
+            self._commit_updates()
+            sqlutils = AXLSQLUtils(self.configname)
+            self._commit_cups(sqlutils)
+            self._commit_bfcp(sqlutils)
+            self._commit_single_number_reach(sqlutils)
+        except Exception as e:
+            log.error('commit failed: %s' % e)
+            errors = self.autorollback and self.rollback() or list()
+            raise exceptions.ChangeSetException('commit failed: %s' % e, e, errors) from e
+        finally:
+            self.discard()
+
+    def rollback(self):
+        """ undo the changes of the last commit in reverse order. Returns a list
+            of (description, exception) for the entries which couldn't
+            be undone.
+        """
+        errors = list()
+        while self.log:
+            entry = self.log.pop()
+            try:
+                entry.undo()
+            except Exception as e:
+                log.error('undo of "%s" failed: %s' % (entry.description, e))
+                errors.append((entry.description, e))
+            else:
+                log.info('undo of "%s"' % entry.description)
+        return errors
+
+    def _record(self, description, undo):
+        with self.lock:
+            self.log.append(ChangeSetEntry(description, undo))
+
+    def _commit_updates(self):
+        """ update the objects concurrently. All updates are done or
+            failed before the first error is raised.
+        """
+        if not self.updates:
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._update, obj, fields) for obj, fields in self.updates.values()]
+        for future in futures:
+            future.result()
+
+    def _update(self, obj, fields):
+        changes = obj.changes()
+        keys = [k for k in changes if fields is None or k in fields]
+        if not keys:
+            return
+        snapshot = obj.__snapshot__ or dict()
+        old = dict([(k, _restore(getattr(obj, k), snapshot.get(k))) for k in keys])
+        obj._call_pooled(obj.update, keys)
+        self._record('update %s %s' % (obj.__name__, obj._uuid), partial(self._revert, obj, old))
+
+    def _revert(self, obj, old):
+        """ set the old values of an update on the object and update it,
+            so only the changed values are sent. Values which were empty
+            before can't be removed again.
+        """
+        for key, value in old.items():
+            setattr(obj, key, value)
+        obj.update(list(old))
+
+    def _commit_cups(self, sqlutils):
+        if not self.cups:
+            return
+        current = sqlutils.has_cups_cupc_many(self.cups.keys())
+        removes, updates = list(), dict()
+        for uuid, (cups, cupc) in self.cups.items():
+            row = current.get(uuid)
+            if row is None:
+                if cups:
+                    # informix has no insert of many rows
+                    sqlutils.insert_cups(uuid, cupc)
+                    self._record('insert cups %s' % uuid, partial(sqlutils.remove_cups, uuid))
+                continue
+            rcups, rcupc = row['enablecups'] == 't', row['enablecupc'] == 't'
+            if rcups and not cups:
+                removes.append((uuid, rcupc))
+            elif rcups and cups and rcupc != cupc:
+                updates.setdefault(cupc, list()).append((uuid, rcupc))
+        if removes:
+            sqlutils.remove_cups_many([uuid for uuid, rcupc in removes])
+            undo = [partial(sqlutils.insert_cups, uuid, rcupc) for uuid, rcupc in removes]
+            self._record('remove cups of %s users' % len(removes), partial(_call_all, undo))
+        self._update_grouped('update cupc', updates, sqlutils.update_cups_many)
+
+    def _commit_bfcp(self, sqlutils):
+        if not self.bfcp:
+            return
+        current = sqlutils.get_bfcp_many(self.bfcp.keys())
+        self._commit_flags('update bfcp', self.bfcp, current, 'enablebfcp', sqlutils.update_bfcp_many)
+
+    def _commit_single_number_reach(self, sqlutils):
+        if not self.single_number_reach:
+            return
+        current = sqlutils.get_single_number_reach_many(self.single_number_reach.keys())
+        self._commit_flags('update single number reach', self.single_number_reach, current,
+                           'enablesinglenumberreach', sqlutils.set_single_number_reach_many)
+
+    def _commit_flags(self, description, values, current, column, update_many):
+        """ set a boolean column for many rows. Rows which don't exist or
+            already have the value are skipped.
+        """
+        updates = dict()
+        for uuid, value in values.items():
+            row = current.get(uuid)
+            if row is None:
+                log.warning('%s: %s not found' % (description, uuid))
+                continue
+            old = row[column] == 't'
+            if old != value:
+                updates.setdefault(value, list()).append((uuid, old))
+        self._update_grouped(description, updates, update_many)
+
+    def _update_grouped(self, description, updates, update_many):
+        """ one update for all rows with the same new value. updates maps
+            the value to a list of (uuid, old value), the undo is grouped
+            by the old values.
+        """
+        for value, rows in updates.items():
+            update_many([uuid for uuid, old in rows], value)
+            undo = dict()
+            for uuid, old in rows:
+                undo.setdefault(old, list()).append(uuid)
+            undo = [partial(update_many, uuids, old) for old, uuids in undo.items()]
+            self._record('%s to %s for %s rows' % (description, value, len(rows)), partial(_call_all, undo))
+
+
+def _restore(value, snapshot):
+    """ return a copy of a suds value with the values of a snapshot
+        (see BaseCCModel._snapshot), nested objects stay suds objects.
+    """
+    if isinstance(value, Object) and isinstance(snapshot, dict):
+        restored = deepcopy(value)
+        for key in restored.__keylist__:
+            setattr(restored, key, _restore(getattr(restored, key), snapshot.get(key)))
+        return restored
+    if isinstance(value, list) and isinstance(snapshot, list) and len(value) == len(snapshot):
+        return [_restore(v, s) for v, s in zip(value, snapshot)]
+    return deepcopy(snapshot)
+
+
+def _call_all(functions):
+    for function in functions:
+        function()
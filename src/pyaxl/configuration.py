@@ -2,7 +2,11 @@ class AXLClientSettings(object):
 
     def __init__(self, host, user, passwd, path, version,
                  schema_path=None, suds_config=None, proxy=dict(),
-                 transport_debugger=False):
+                 transport_debugger=False, pool_size=4, async_limit=None,
+                 keepalive=False, http_pool_size=4, http_idle_timeout=60,
+                 object_cache_size=0, object_cache_ttl=300,
+                 template_operations=(), rate_limit_read=0, rate_limit_write=0,
+                 rate_limit_queue=64, rate_limit_retries=3, instrumentation=False):
 
         self.host = host
         self.user = user
@@ -12,6 +16,19 @@ class AXLClientSettings(object):
         self.suds_config = dict()
         self.proxy = proxy
         self.transport_debugger = transport_debugger
+        self.pool_size = pool_size
+        self.async_limit = async_limit
+        self.keepalive = keepalive
+        self.http_pool_size = http_pool_size
+        self.http_idle_timeout = http_idle_timeout
+        self.object_cache_size = object_cache_size
+        self.object_cache_ttl = object_cache_ttl
+        self.template_operations = template_operations
+        self.rate_limit_read = rate_limit_read
+        self.rate_limit_write = rate_limit_write
+        self.rate_limit_queue = rate_limit_queue
+        self.rate_limit_retries = rate_limit_retries
+        self.instrumentation = instrumentation
         if suds_config is not None:
             self.suds_config = suds_config
         self.version = '.'.join((str(version).split('.') + ['0'])[:2])
@@ -24,3 +24,23 @@ class LogoutException(PyAXLException):
 
 class NotAttachedException(PyAXLException):
     pass
+
+
+class ThrottledException(PyAXLException):
+    pass
+
+
+class ReplayException(PyAXLException):
+    pass
+
+
+class ChangeSetException(PyAXLException):
+    """ a commit of a ChangeSet failed. error is the exception of the
+        failed change, rollback_errors a list of (description, exception)
+        for the changes which couldn't be undone.
+    """
+
+    def __init__(self, message, error=None, rollback_errors=None):
+        super(ChangeSetException, self).__init__(message)
+        self.error = error
+        self.rollback_errors = rollback_errors or list()
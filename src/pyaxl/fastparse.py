@@ -0,0 +1,138 @@
+import io
+import logging
+from xml.etree.ElementTree import iterparse
+
+from suds.plugin import PluginContainer
+from suds.transport import Request
+from suds.transport import TransportError
+
+from pyaxl import metrics
+
+
+log = logging.getLogger('pyaxl')
+
+# Envelope/Body/<method>Response/return/<item>
+ITEM_DEPTH = 5
+
+
+def send(client, name, *args, **kwargs):
+    """ send a request built by suds and return the reply as bytes,
+        without letting suds parse it. A SOAP fault is still raised
+        by suds as WebFault. With instrumentation the call is measured
+        until the reply is received, the parsing is done later. The
+        plugins of the client see the request and the reply like with
+        suds (marshalled, sending and received).
+    """
+    if metrics.enabled(client.configname):
+        with metrics.measure(client.configname, name):
+            return _send(client, name, *args, **kwargs)
+    return _send(client, name, *args, **kwargs)
+
+
+def _send(client, name, *args, **kwargs):
+    method = getattr(client.builder().service, name)
+    ctx = method(*args, **kwargs)
+    log.debug('send %s, the reply is parsed by pyaxl.fastparse' % name)
+    reply = post(client, method.method, ctx.envelope, ctx.process_reply)
+    if reply is not None and client.options.plugins:
+        reply = PluginContainer(client.options.plugins).message.received(reply=reply).reply
+    return reply
+
+
+def post(client, method, envelope, process_reply):
+    """ send an envelope with the transport of the client and return
+        the reply as bytes or None if there is no reply. For a SOAP fault
+        process_reply is called, which raises the WebFault.
+    """
+    action = method.soap.action
+    if isinstance(action, str):
+        action = action.encode('utf-8')
+    headers = {'Content-Type': 'text/xml; charset=utf-8', 'SOAPAction': action}
+    headers.update(client.options.headers)
+    request = Request(client.options.location or method.location, envelope)
+    request.headers = headers
+    try:
+        reply = client.options.transport.send(request)
+    except TransportError as e:
+        if e.httpcode != 500 or e.fp is None:
+            raise
+        process_reply(e.fp.read(), 500, str(e))
+        raise
+    if reply is None:
+        return None
+    return reply.message
+
+
+def localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def value(element):
+    """ return the value of an element like suds would do it, but as
+        str and dict. Empty elements are None, elements with attributes
+        or children are dicts. Attributes are prefixed with "_".
+    """
+    children = list(element)
+    if not children and not element.attrib:
+        return element.text or None
+    result = dict([('_%s' % k, v) for k, v in element.attrib.items()])
+    if not children:
+        result['value'] = element.text or None
+        return result
+    for child in children:
+        name = localname(child.tag)
+        if name in result:
+            if not isinstance(result[name], list):
+                result[name] = [result[name]]
+            result[name].append(value(child))
+        else:
+            result[name] = value(child)
+    return result
+
+
+def iter_items(reply):
+    """ yield the elements inside of the return element of a reply.
+        Each element is removed from the tree after it was used, so only
+        one item is held in memory.
+    """
+    if not reply:
+        return
+    depth = 0
+    parent = None
+    inbody = False
+    for event, element in iterparse(io.BytesIO(reply), events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 2:
+                inbody = localname(element.tag) == 'Body'
+            elif depth == ITEM_DEPTH - 1:
+                parent = element
+            continue
+        if depth == ITEM_DEPTH and inbody:
+            yield element
+            parent.remove(element)
+        depth -= 1
+
+
+def iter_list(reply, returns):
+    """ yield a tuple with the values of returns for each object in
+        the reply of a list request. _uuid is taken from the attribute.
+    """
+    for item in iter_items(reply):
+        children = dict([(localname(c.tag), c) for c in item])
+        row = list()
+        for name in returns:
+            if name.startswith('_'):
+                row.append(item.get(name[1:]))
+            elif name in children:
+                row.append(value(children[name]))
+            else:
+                row.append(None)
+        yield tuple(row)
+
+
+def iter_rows(reply):
+    """ yield a dict for each row in the reply of executeSQLQuery.
+    """
+    for item in iter_items(reply):
+        yield dict([(localname(c.tag), c.text or None) for c in item])
@@ -0,0 +1,234 @@
+import time
+import bisect
+import logging
+import threading
+import pyaxl
+from contextlib import contextmanager
+from suds.transport import Transport
+
+
+log = logging.getLogger('pyaxl')
+
+PHASES = ('serialize', 'wait', 'network', 'server', 'parse', 'total')
+SIZES = ('request', 'response')
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+local = threading.local()
+
+
+class Measurement(object):
+    """ Times and sizes of one AXL call:
+
+        serialize: building the request until it's given to the transport
+        wait: waiting for the rate limiter, see pyaxl.ratelimit
+        network: sending the request and reading the response
+        server: waiting for the response headers after the request was
+                sent, only measured by KeepAliveTransport
+        parse: processing the reply until the result is returned
+        total: the whole call
+
+        The times are in seconds, the sizes in bytes. error is the name
+        of the exception if the call failed.
+    """
+
+    def __init__(self, configname, operation):
+        self.configname = configname
+        self.operation = operation
+        self.start = time.monotonic()
+        self.sent = None
+        self.received = None
+        self.serialize = self.wait = self.network = self.parse = self.total = 0.0
+        self.server = None
+        self.request = self.response = 0
+        self.error = None
+
+    def __repr__(self):
+        return '<Measurement %s %.1fms>' % (self.operation, self.total * 1000)
+
+    def sending(self):
+        """ mark the time the request is given to the transport.
+        """
+        if self.sent is None:
+            self.sent = time.monotonic()
+
+    def finish(self):
+        end = time.monotonic()
+        self.total = end - self.start
+        if self.sent is not None:
+            self.serialize = self.sent - self.start
+        if self.received is not None:
+            self.parse = end - self.received
+        if self.server is not None:
+            self.network = max(0.0, self.network - self.server)
+
+
+class Histogram(object):
+    """ Histogram with fixed buckets like the ones of Prometheus.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def export(self):
+        """ return the cumulative count for each upper bound.
+        """
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        buckets, cumulative = list(), 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            cumulative += n
+            buckets.append((bound, cumulative))
+        return dict(buckets=buckets, sum=total, count=count)
+
+
+class Registry(object):
+    """ Collects the measurements of all AXL calls in histograms per
+        configuration and operation. Callbacks are called with each
+        Measurement, e.g. to send them to a metrics system.
+    """
+
+    def __init__(self):
+        self.histograms = dict()
+        self.errors = dict()
+        self.callbacks = list()
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self.callbacks.remove(callback)
+
+    def histogram(self, name, configname, operation):
+        key = name, configname, operation
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                buckets = name.endswith('_bytes') and SIZE_BUCKETS or TIME_BUCKETS
+                histogram = self.histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def record(self, measurement):
+        m = measurement
+        for phase in PHASES:
+            value = getattr(m, phase)
+            if value is not None:
+                self.histogram('axl_%s_seconds' % phase, m.configname, m.operation).observe(value)
+        for size in SIZES:
+            self.histogram('axl_%s_bytes' % size, m.configname, m.operation).observe(getattr(m, size))
+        if m.error is not None:
+            key = m.configname, m.operation, m.error
+            with self.lock:
+                self.errors[key] = self.errors.get(key, 0) + 1
+        for callback in list(self.callbacks):
+            try:
+                callback(m)
+            except Exception:
+                log.exception('metrics callback %r failed' % callback)
+
+    def export(self):
+        """ return all histograms and error counters as dicts with name,
+            labels and the values.
+        """
+        result = list()
+        for (name, configname, operation), histogram in sorted(self.histograms.items()):
+            entry = dict(name=name, labels=dict(configname=configname, operation=operation))
+            entry.update(histogram.export())
+            result.append(entry)
+        for (configname, operation, error), count in sorted(self.errors.items()):
+            result.append(dict(name='axl_errors_total', count=count,
+                               labels=dict(configname=configname, operation=operation, error=error)))
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.errors.clear()
+
+
+registry = Registry()
+
+
+class InstrumentedMethod(object):
+    """ Wraps the method of an AXL operation and measures each call.
+    """
+
+    def __init__(self, method, configname, name):
+        self.wrapped = method
+        self.method = method.method
+        self.configname = configname
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        with measure(self.configname, self.name):
+            return self.wrapped(*args, **kwargs)
+
+
+class InstrumentedTransport(Transport):
+    """ Transport which measures the time and the sizes of the requests
+        sent by another transport.
+    """
+
+    def __init__(self, transport):
+        super(InstrumentedTransport, self).__init__()
+        self.transport = transport
+        self.options = transport.options
+
+    def open(self, request):
+        return self.transport.open(request)
+
+    def send(self, request):
+        m = current()
+        if m is None:
+            return self.transport.send(request)
+        m.sending()
+        start = time.monotonic()
+        try:
+            reply = self.transport.send(request)
+        finally:
+            m.received = time.monotonic()
+            m.network += m.received - start
+            m.request += len(request.message or b'')
+        if reply is not None:
+            m.response += len(reply.message or b'')
+        return reply
+
+
+def enabled(configname):
+    return pyaxl.configuration.registry.get(configname).instrumentation
+
+
+def current():
+    """ return the Measurement of the call running in this thread or None.
+    """
+    return getattr(local, 'measurement', None)
+
+
+@contextmanager
+def measure(configname, operation):
+    """ measure an AXL call. Nested calls are part of the outer call.
+    """
+    if current() is not None:
+        yield current()
+        return
+    m = local.measurement = Measurement(configname, operation)
+    try:
+        yield m
+    except Exception as e:
+        m.error = e.__class__.__name__
+        raise
+    finally:
+        local.measurement = None
+        m.finish()
+        registry.record(m)
@@ -0,0 +1,121 @@
+import time
+import logging
+import threading
+import pyaxl
+from collections import OrderedDict
+
+from pyaxl import utils
+
+
+log = logging.getLogger('pyaxl')
+
+
+class ObjectCache(object):
+    """ Cache for objects loaded from callmanager. The entries expire
+        after ttl seconds and if the cache is full, the least recently
+        used entry is removed. Objects are stored and returned as copies,
+        so changes on a returned object don't affect the cache.
+
+        The key of an entry is the type and the search criteria of
+        the get request. Because an object can be loaded by name
+        or by uuid, all keys are remembered by uuid for invalidation.
+    """
+
+    caches = dict()
+    lock = threading.Lock()
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.uuids = dict()
+        self.hits = 0
+        self.misses = 0
+        self.entrylock = threading.Lock()
+
+    @classmethod
+    def get_cache(cls, configname='default'):
+        """ return the cache of a configuration or None if the cache
+            is disabled (object_cache_size).
+        """
+        cache = cls.caches.get(configname)
+        if cache is not None:
+            return cache
+        config = pyaxl.configuration.registry.get(configname)
+        if not config.object_cache_size:
+            return None
+        with cls.lock:
+            if configname not in cls.caches:
+                cls.caches[configname] = ObjectCache(config.object_cache_size, config.object_cache_ttl)
+            return cls.caches[configname]
+
+    @staticmethod
+    def key(name, args, kwargs):
+        """ return the key for a get request or None if the criteria
+            can't be used as key.
+        """
+        kwargs = dict(kwargs)
+        if 'uuid' in kwargs:
+            kwargs['uuid'] = utils.uuid(kwargs['uuid'])
+        key = name, tuple(args), tuple(sorted(kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key):
+        """ return a copy of the cached object or None.
+        """
+        with self.entrylock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return utils.copy_object(entry[2])
+
+    def put(self, key, uuid, obj):
+        """ store a copy of an object. uuid is needed to invalidate the
+            entry on update or remove.
+        """
+        obj = utils.copy_object(obj)
+        uuid = utils.uuid(uuid)
+        with self.entrylock:
+            self._remove(key)
+            self.entries[key] = time.monotonic() + self.ttl, uuid, obj
+            self.uuids.setdefault((key[0], uuid), set()).add(key)
+            while len(self.entries) > self.size:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, name, uuid):
+        """ remove all entries of an object.
+        """
+        with self.entrylock:
+            for key in list(self.uuids.get((name, utils.uuid(uuid)), ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.entrylock:
+            self.entries.clear()
+            self.uuids.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """ return the hits, misses and the number of entries.
+        """
+        return dict(hits=self.hits, misses=self.misses, size=len(self.entries))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.uuids.get((key[0], entry[1]))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.uuids[(key[0], entry[1])]
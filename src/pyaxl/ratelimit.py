@@ -0,0 +1,172 @@
+import io
+import time
+import logging
+import threading
+import pyaxl
+from suds.transport import Transport
+from suds.transport import TransportError
+
+from pyaxl import metrics
+from pyaxl import exceptions
+
+
+log = logging.getLogger('pyaxl')
+
+THROTTLE_FAULTS = ('maximum axl memory allocation consumed', 'throttl')
+READ_OPERATIONS = ('get', 'list', 'executeSQLQuery')
+MIN_RATE = 0.5
+DECREASE = 0.5
+
+
+class RateLimiter(object):
+    """ Token bucket which allows rate requests per second. The rate is
+        adjusted like AIMD: each successful request increases the rate a
+        little up to the configured rate, a request throttled by
+        callmanager halves it. At most queue_size requests wait for a
+        token, further requests raise a ThrottledException.
+    """
+
+    limiters = dict()
+    lock = threading.Lock()
+
+    def __init__(self, rate, queue_size):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.queue_size = queue_size
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    @classmethod
+    def get_limiter(cls, configname, kind):
+        """ return the limiter of a configuration for "read" or "write"
+            requests or None if the rate isn't limited. The limiters are
+            shared by all clients of a configuration.
+        """
+        key = configname, kind
+        limiter = cls.limiters.get(key)
+        if limiter is not None:
+            return limiter
+        config = pyaxl.configuration.registry.get(configname)
+        rate = getattr(config, 'rate_limit_%s' % kind)
+        if not rate:
+            return None
+        with cls.lock:
+            if key not in cls.limiters:
+                cls.limiters[key] = RateLimiter(rate, config.rate_limit_queue)
+            return cls.limiters[key]
+
+    def acquire(self):
+        """ wait until a request can be sent.
+        """
+        with self.condition:
+            if self.waiting >= self.queue_size:
+                raise exceptions.ThrottledException('%s requests are already waiting for the rate limiter' % self.waiting)
+            self.waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    self.condition.wait((1 - self.tokens) / self.rate)
+            finally:
+                self.waiting -= 1
+
+    def succeeded(self):
+        """ additive increase, the rate grows by about one request per
+            second for each rate successful requests.
+        """
+        with self.condition:
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+    def throttled(self):
+        """ multiplicative decrease after callmanager throttled a request.
+        """
+        with self.condition:
+            self._refill()
+            self.rate = max(MIN_RATE, self.rate * DECREASE)
+            self.tokens = min(self.tokens, 0.0)
+        log.warning('request was throttled, reduce rate to %.1f/s' % self.rate)
+
+    def _refill(self):
+        now = time.monotonic()
+        burst = max(1.0, self.rate)
+        self.tokens = min(burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimitedTransport(Transport):
+    """ Transport which sends the requests with another transport, but
+        not faster than the rate limiters of the configuration allow.
+        Requests throttled by callmanager are sent again up to retries
+        times.
+    """
+
+    def __init__(self, transport, configname, retries):
+        super(RateLimitedTransport, self).__init__()
+        self.transport = transport
+        self.options = transport.options
+        self.configname = configname
+        self.retries = retries
+
+    def open(self, request):
+        return self.transport.open(request)
+
+    def send(self, request):
+        limiter = RateLimiter.get_limiter(self.configname, kind(request))
+        if limiter is None:
+            return self.transport.send(request)
+        m = metrics.current()
+        if m is not None:
+            m.sending()
+        retries = 0
+        while True:
+            start = time.monotonic()
+            limiter.acquire()
+            if m is not None:
+                m.wait += time.monotonic() - start
+            try:
+                reply = self.transport.send(request)
+            except TransportError as e:
+                if not throttled_reply(e) or retries >= self.retries:
+                    raise
+                limiter.throttled()
+                retries += 1
+                continue
+            limiter.succeeded()
+            return reply
+
+
+def kind(request):
+    """ return "read" or "write" for the AXL operation of a request.
+    """
+    action = request.headers.get('SOAPAction', '')
+    if isinstance(action, bytes):
+        action = action.decode('utf-8')
+    operation = action.strip('"').split(' ')[-1]
+    if operation.startswith(READ_OPERATIONS):
+        return 'read'
+    return 'write'
+
+
+def throttled(message):
+    """ check if a fault says that callmanager refused the request
+        because of its limits.
+    """
+    message = message.lower()
+    return any([i in message for i in THROTTLE_FAULTS])
+
+
+def throttled_reply(error):
+    """ check if a transport error is a throttled request. The body of
+        a fault is read and put back, so it can still be parsed.
+    """
+    if error.httpcode == 503:
+        return True
+    if error.httpcode != 500 or error.fp is None:
+        return False
+    body = error.fp.read()
+    error.fp = io.BytesIO(body)
+    return throttled(body.decode('utf-8', 'replace'))
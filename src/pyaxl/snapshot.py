@@ -0,0 +1,247 @@
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from xml.etree.ElementTree import fromstring
+from suds import WebFault
+from suds import MethodNotFound
+from suds.sudsobject import Property
+
+from pyaxl import utils
+from pyaxl import fastparse
+from pyaxl.axlsql import AXLSQL
+
+
+log = logging.getLogger('pyaxl')
+
+# tkclass of the device table
+PHONE = '1'
+DEVICE_PROFILE = '254'
+
+# table in the snapshot: table in callmanager, columns and condition
+TABLES = OrderedDict([
+    ('devicepool', ('devicepool', ('pkid', 'name'), '')),
+    ('routepartition', ('routepartition', ('pkid', 'name'), '')),
+    ('device', ('device', ('pkid', 'name', 'tkclass', 'fkdevicepool', 'description'), '')),
+    ('numplan', ('numplan', ('pkid', 'dnorpattern', 'fkroutepartition'), 'tkpatternusage = 2')),
+    ('devicenumplanmap', ('devicenumplanmap', ('pkid', 'fkdevice', 'fknumplan', 'numplanindex'), ''))])
+INDEXES = (('device', 'name'),
+           ('device', 'fkdevicepool'),
+           ('devicepool', 'name'),
+           ('numplan', 'dnorpattern'),
+           ('devicenumplanmap', 'fkdevice'),
+           ('devicenumplanmap', 'fknumplan'))
+# types of listChange and the tables they change
+CHANGE_TYPES = dict(Phone='device',
+                    DeviceProfile='device',
+                    CtiRoutingPoint='device',
+                    Line='numplan',
+                    DevicePool='devicepool',
+                    RoutePartition='routepartition')
+DEVICES = """SELECT d.*, p.name AS devicepool FROM device d
+             LEFT JOIN devicepool p ON p.pkid = d.fkdevicepool"""
+
+
+class Snapshot(object):
+    """ Local copy of the devices, lines and device pools of callmanager
+        in a SQLite database, so lookups don't need a request. The
+        snapshot is filled with sync and kept up to date with refresh,
+        which only reloads the objects changed since the last sync or
+        refresh (AXL change notification, listChange). If listChange is
+        not supported, refresh does a full sync.
+    """
+
+    def __init__(self, path=':memory:', configname='default'):
+        self.configname = configname
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            for table, (name, columns, where) in TABLES.items():
+                self.db.execute('CREATE TABLE IF NOT EXISTS %s (%s PRIMARY KEY, %s)' % (
+                    table, columns[0], ', '.join(columns[1:])))
+            for table, column in INDEXES:
+                self.db.execute('CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)' % (table, column, table, column))
+            self.db.execute('CREATE TABLE IF NOT EXISTS state (key PRIMARY KEY, value)')
+
+    def sync(self):
+        """ load all tables from callmanager.
+        """
+        position = self._position()
+        for table in TABLES:
+            self.load(table)
+        self._setstate(position)
+
+    def load(self, table):
+        """ load all rows of one table from callmanager.
+        """
+        name, columns, where = TABLES[table]
+        sql = 'FROM %s %s ORDER BY pkid' % (name, where and 'WHERE %s' % where)
+        rows = AXLSQL(self.configname).query(columns, sql)
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM %s' % table)
+            self.db.executemany('INSERT INTO %s VALUES (%s)' % (table, ', '.join('?' * len(columns))),
+                                (normalize(columns, row) for row in rows))
+        log.info('snapshot table %s was loaded' % table)
+
+    def refresh(self):
+        """ reload the objects that were changed since the last sync or
+            refresh. Returns the number of changes.
+        """
+        state = self._getstate()
+        if state is None:
+            log.info('no change position for the snapshot, sync all tables')
+            self.sync()
+            return None
+        queueid, start = state
+        changes = OrderedDict()
+        while True:
+            info, items, count = self._list_changes(queueid, start)
+            if info.get('queueId') != queueid or int(start) < int(info.get('firstChangeId') or 0):
+                log.warning('changes for the snapshot were lost, sync all tables')
+                self.sync()
+                return None
+            for change in items:
+                changes[change] = None
+            start = info.get('nextStartChangeId')
+            # a page can hold only changes of other types, stop only
+            # if callmanager has no more changes
+            if not count or start is None or int(start) > int(info.get('lastChangeId') or 0):
+                break
+        self._apply(changes)
+        if start is not None:
+            self._setstate((queueid, start))
+        return len(changes)
+
+    def device(self, name):
+        """ return the device with the given name as dict or None.
+        """
+        rows = self._select('%s WHERE d.name = ?' % DEVICES, (name,))
+        return rows and rows[0] or None
+
+    def devices(self, devicepool=None, pattern=None, tkclass=None):
+        """ return the devices as dicts, e.g. all phones in a device pool
+            or the device profiles with a DN:
+
+                snapshot.devices(pattern='4711', tkclass=DEVICE_PROFILE)
+        """
+        where, args = list(), list()
+        if devicepool is not None:
+            where.append('p.name = ?')
+            args.append(devicepool)
+        if pattern is not None:
+            where.append("""d.pkid IN (SELECT m.fkdevice FROM devicenumplanmap m
+                            JOIN numplan n ON n.pkid = m.fknumplan WHERE n.dnorpattern = ?)""")
+            args.append(pattern)
+        if tkclass is not None:
+            where.append('d.tkclass = ?')
+            args.append(str(tkclass))
+        sql = DEVICES
+        if where:
+            sql = '%s WHERE %s' % (sql, ' AND '.join(where))
+        return self._select('%s ORDER BY d.name' % sql, args)
+
+    def lines(self, device):
+        """ return the lines of a device as dicts ordered by index.
+        """
+        return self._select("""SELECT n.*, m.numplanindex, r.name AS routepartition FROM devicenumplanmap m
+                               JOIN device d ON d.pkid = m.fkdevice
+                               JOIN numplan n ON n.pkid = m.fknumplan
+                               LEFT JOIN routepartition r ON r.pkid = n.fkroutepartition
+                               WHERE d.name = ? ORDER BY m.numplanindex""", (device,))
+
+    def _select(self, sql, args=()):
+        with self.lock:
+            return [dict(row) for row in self.db.execute(sql, args)]
+
+    def _apply(self, changes):
+        """ reload or delete the changed objects, changes are tuples
+            of (table, uuid, action).
+        """
+        tables = dict()
+        for table, uuid, action in changes:
+            tables.setdefault(table, OrderedDict())[uuid] = action
+        sql = AXLSQL(self.configname)
+        for table, actions in tables.items():
+            name, columns, where = TABLES[table]
+            uuids = list(actions.keys())
+            query = 'SELECT %s FROM %s WHERE %spkid IN (%%(values)s)' % (
+                ', '.join(columns), name, where and '%s AND ' % where)
+            rows = [normalize(columns, [row.get(c) for c in columns]) for row in sql._exec_in(query, uuids)]
+            maps = list()
+            if table == 'device':
+                mapcolumns = TABLES['devicenumplanmap'][1]
+                query = 'SELECT %s FROM devicenumplanmap WHERE fkdevice IN (%%(values)s)' % ', '.join(mapcolumns)
+                maps = [normalize(mapcolumns, [row.get(c) for c in mapcolumns]) for row in sql._exec_in(query, uuids)]
+            with self.lock, self.db:
+                self.db.executemany('DELETE FROM %s WHERE pkid = ?' % table, [(i,) for i in uuids])
+                self.db.executemany('INSERT OR REPLACE INTO %s VALUES (%s)' % (
+                    table, ', '.join('?' * len(columns))), rows)
+                if table == 'device':
+                    self.db.executemany('DELETE FROM devicenumplanmap WHERE fkdevice = ?', [(i,) for i in uuids])
+                    self.db.executemany('INSERT OR REPLACE INTO devicenumplanmap VALUES (?, ?, ?, ?)', maps)
+                elif table == 'numplan':
+                    removed = [(i,) for i, action in actions.items() if action == 'r']
+                    self.db.executemany('DELETE FROM devicenumplanmap WHERE fknumplan = ?', removed)
+            log.info('snapshot table %s: %s changes' % (table, len(uuids)))
+
+    def _list_changes(self, queueid=None, start=None):
+        """ return the queue info, the changes as (table, uuid, action)
+            since start and the number of all changes in the reply.
+            Changes of types not in the snapshot are skipped.
+        """
+        kwargs = dict()
+        if start is not None:
+            # suds marshals a dict with a value as child element, a value
+            # with attributes must be a Property
+            startchangeid = Property(str(start))
+            startchangeid._queueId = queueid
+            kwargs['startChangeId'] = startchangeid
+        reply = fromstring(fastparse.send(AXLSQL(self.configname).client, 'listChange', **kwargs))
+        info, changes, count = dict(), list(), 0
+        for element in reply.iter():
+            name = fastparse.localname(element.tag)
+            if name == 'queueInfo':
+                info = fastparse.value(element)
+            elif name == 'change':
+                count += 1
+                if element.get('type') in CHANGE_TYPES:
+                    action = [c.text for c in element if fastparse.localname(c.tag) == 'action']
+                    changes.append((CHANGE_TYPES[element.get('type')], utils.uuid(element.get('uuid')),
+                                    action and action[0] or 'u'))
+        return info, changes, count
+
+    def _position(self):
+        """ return the queue id and the next change id of callmanager or
+            None if listChange isn't supported.
+        """
+        try:
+            info = self._list_changes()[0]
+        except (MethodNotFound, WebFault) as e:
+            log.info('listChange is not available, refresh will sync all tables: %s' % e)
+            return None
+        return info.get('queueId'), info.get('nextStartChangeId') or info.get('lastChangeId')
+
+    def _getstate(self):
+        with self.lock:
+            state = dict(self.db.execute('SELECT key, value FROM state'))
+        if state.get('queueid') is None or state.get('changeid') is None:
+            return None
+        return state['queueid'], state['changeid']
+
+    def _setstate(self, position):
+        queueid, changeid = position or (None, None)
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO state VALUES (?, ?)',
+                                (('queueid', queueid), ('changeid', changeid)))
+
+
+def normalize(columns, row):
+    """ return the values of a row, the uuids as blank uuids.
+    """
+    values = list()
+    for column, value in zip(columns, row):
+        if value is not None and (column == 'pkid' or column.startswith('fk')):
+            value = utils.uuid(value)
+        values.append(value)
+    return tuple(values)
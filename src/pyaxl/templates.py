@@ -0,0 +1,136 @@
+import re
+import logging
+import threading
+from copy import copy
+from collections import OrderedDict
+from suds.sax.enc import Encoder
+from suds.sudsobject import Object
+
+from pyaxl import fastparse
+
+
+log = logging.getLogger('pyaxl')
+
+# private use code points, they can't be part of a valid AXL value
+MARKER = '\ue000%s\ue001'
+REGEX_MARKER = re.compile(MARKER.replace('%s', '([0-9]+)').encode('utf-8'))
+MAX_TEMPLATES = 256
+
+
+class EnvelopeTemplate(object):
+    """ A SOAP envelope built once by suds with markers instead of the
+        str values of the arguments. For the next calls with arguments of
+        the same structure only the escaped values are put into the
+        template, so the schema isn't walked again. All other values
+        (e.g. None, int, bool) are part of the template.
+    """
+
+    encoder = Encoder()
+
+    def __init__(self, client, name, args, kwargs):
+        values = list()
+        method = getattr(client.builder().service, name)
+        ctx = method(*mark(args, values), **mark(kwargs, values))
+        self.method = method.method
+        self.process_reply = ctx.process_reply
+        self.parts = REGEX_MARKER.split(ctx.envelope)
+
+    def render(self, values):
+        """ return the envelope with the values as bytes.
+        """
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = self.encoder.encode(values[int(parts[i])]).encode('utf-8')
+        return b''.join(parts)
+
+
+class EnvelopeCache(object):
+    """ The templates of a client, the least recently used template
+        is dropped if there are more than size.
+    """
+
+    def __init__(self, size=MAX_TEMPLATES):
+        self.size = size
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def get(self, key):
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+            return template
+
+    def put(self, key, template):
+        with self.lock:
+            self.templates[key] = template
+            self.templates.move_to_end(key)
+            while len(self.templates) > self.size:
+                self.templates.popitem(last=False)
+
+
+class TemplateMethod(object):
+    """ Callable like a suds method, but the envelope is rendered from
+        an EnvelopeTemplate. The reply is still processed by suds.
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.method = getattr(client.service, name).method
+
+    def __call__(self, *args, **kwargs):
+        values = list()
+        key = self.name, shape(args, values), shape(kwargs, values)
+        template = self.client.envelopes.get(key)
+        if template is None:
+            with lock:
+                template = self.client.envelopes.get(key)
+                if template is None:
+                    log.debug('build envelope template for %s' % self.name)
+                    template = EnvelopeTemplate(self.client, self.name, args, kwargs)
+                    self.client.envelopes.put(key, template)
+        envelope = template.render(values)
+        reply = fastparse.post(self.client, template.method, envelope, template.process_reply)
+        return template.process_reply(reply)
+
+
+lock = threading.Lock()
+
+
+def shape(value, values):
+    """ return the structure of the arguments as hashable key and
+        collect the str values.
+    """
+    if isinstance(value, Object):
+        return value.__class__, tuple([(k, shape(getattr(value, k), values)) for k in value.__keylist__])
+    if isinstance(value, dict):
+        return tuple([(k, shape(v, values)) for k, v in value.items()])
+    if isinstance(value, (list, tuple)):
+        return (list, tuple([shape(i, values) for i in value]))
+    if isinstance(value, str):
+        values.append(str(value))
+        return str
+    return type(value), value
+
+
+def mark(value, values):
+    """ return the arguments with markers instead of the str values.
+    """
+    if isinstance(value, Object):
+        marked = copy(value)
+        marked.__dict__['__keylist__'] = list(value.__keylist__)
+        for k in value.__keylist__:
+            setattr(marked, k, mark(getattr(value, k), values))
+        return marked
+    if isinstance(value, dict):
+        return dict([(k, mark(v, values)) for k, v in value.items()])
+    if isinstance(value, (list, tuple)):
+        return [mark(i, values) for i in value]
+    if isinstance(value, str):
+        values.append(value)
+        return MARKER % (len(values) - 1)
+    return value
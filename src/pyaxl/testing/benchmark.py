@@ -0,0 +1,260 @@
+import gc
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+import subprocess
+from copy import copy
+from contextlib import contextmanager
+from suds.sax.text import Text
+from suds.sudsobject import Object
+
+import pyaxl
+from pyaxl import ccm
+from pyaxl import axlhandler
+from pyaxl.axlsql import AXLSQL
+from pyaxl.axlhandler import AXLClient
+from pyaxl.testing.server import FakeAXLServer
+from pyaxl.testing.server import objectid
+
+
+CONFIGNAME = 'benchmark'
+
+
+def timed(func, *args, **kwargs):
+    """ return the seconds used by func and its result.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else 0.0
+
+
+def bench_startup(args):
+    """ the first client parses the schema and writes the bundle,
+        the next one loads the bundle. The memory of a client from the
+        bundle is measured with a third one, tracemalloc slows it down.
+    """
+    first, client = timed(AXLClient, CONFIGNAME)
+    again, client = timed(AXLClient, CONFIGNAME)
+    del client
+    gc.collect()
+    tracemalloc.start()
+    try:
+        client = AXLClient(CONFIGNAME)
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return dict(startup_first=(first, 's'), startup=(again, 's'), startup_memory=(used, 'bytes'))
+
+
+def bench_list(args):
+    criteria, returns = dict(lastName='%'), ('firstName', 'lastName')
+    results = dict()
+    for name, fast in (('list', False), ('list_fast', True)):
+        seconds, rows = timed(lambda: sum(1 for i in ccm.User.list(criteria, returns, configname=CONFIGNAME, fast=fast)))
+        results['%s_rows' % name] = (rate(rows, seconds), 'rows/s')
+    seconds, rows = timed(lambda: sum(1 for i in AXLSQL(CONFIGNAME).query(('pkid', 'name'), 'FROM device ORDER BY pkid')))
+    results['sql_query_rows'] = (rate(rows, seconds), 'rows/s')
+    return results
+
+
+def bench_requests(args):
+    uuids = [objectid(i) for i in range(args.objects)]
+    seconds, users = timed(lambda: [ccm.User(uuid=i, configname=CONFIGNAME) for i in uuids])
+    results = dict(get=(rate(len(users), seconds), 'requests/s'))
+    seconds, users = timed(lambda: list(ccm.User.get_many(uuids, args.workers, CONFIGNAME)))
+    results['get_many'] = (rate(len(users), seconds), 'requests/s')
+
+    def update():
+        for i, user in enumerate(users):
+            user.lastName = 'Benchmark%s' % i
+            user.update()
+    seconds, result = timed(update)
+    results['update'] = (rate(len(users), seconds), 'requests/s')
+
+    def create():
+        for i in range(args.objects):
+            user = ccm.User(configname=CONFIGNAME)
+            user.userid = 'benchmark%s' % i
+            user.lastName = 'Benchmark'
+            user.create()
+    seconds, result = timed(create)
+    results['create'] = (rate(args.objects, seconds), 'requests/s')
+    return results
+
+
+def bench_memory(args):
+    uuids = [objectid(i) for i in range(args.objects)]
+    results = dict()
+    for name, load in (('memory_object', lambda i: ccm.User(uuid=i, configname=CONFIGNAME)),
+                       ('memory_compact', lambda i: ccm.User.get_compact(uuid=i, configname=CONFIGNAME))):
+        load(uuids[0])
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            objs = [load(i) for i in uuids]
+            gc.collect()
+            used = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        results[name] = (used / len(objs), 'bytes')
+        del objs
+    return results
+
+
+def skip_empty_tags_copy(obj):
+    """ the former implementation of _skip_empty_tags, which copies
+        each nested object and deletes the empty tags afterwards.
+    """
+    copyobj = copy(obj)
+    keylist = list()
+    for key in obj.__keylist__:
+        value = getattr(obj, key)
+        if isinstance(value, list):
+            copyobj[key] = [i if isinstance(i, Text) else skip_empty_tags_copy(i) for i in value]
+            keylist.append(key)
+        elif isinstance(value, Object):
+            copyobj[key] = skip_empty_tags_copy(value)
+            keylist.append(key)
+        else:
+            if isinstance(value, Text) and value != '' and value is not None:
+                keylist.append(key)
+            else:
+                del copyobj.__dict__[key]
+    copyobj.__keylist__ = keylist
+    return copyobj
+
+
+def bench_prune(args):
+    """ prune the empty tags of a user like create does, with the
+        current and the former implementation.
+    """
+    user = ccm.User(uuid=objectid(0), configname=CONFIGNAME)
+    fields = [getattr(user, k) for k in user.__keylist__ if isinstance(getattr(user, k), Object)]
+    runs = args.objects * 10
+
+    def prune(func):
+        for i in range(runs):
+            for value in fields:
+                func(value)
+            func(user)
+    results = dict()
+    for name, func in (('prune', user._skip_empty_tags), ('prune_copy', skip_empty_tags_copy)):
+        seconds, result = timed(prune, func)
+        results[name] = (rate(runs, seconds), 'objects/s')
+    return results
+
+
+BENCHMARKS = (('startup', bench_startup),
+              ('list', bench_list),
+              ('requests', bench_requests),
+              ('memory', bench_memory),
+              ('prune', bench_prune))
+
+
+@contextmanager
+def temporary_cache():
+    """ write the caches and bundles of the clients to a temporary
+        directory, which is removed afterwards.
+    """
+    path = axlhandler.CACHE_PATH
+    axlhandler.CACHE_PATH = tempfile.mkdtemp(prefix='pyaxl-benchmark-')
+    try:
+        yield axlhandler.CACHE_PATH
+    finally:
+        shutil.rmtree(axlhandler.CACHE_PATH, ignore_errors=True)
+        axlhandler.CACHE_PATH = path
+
+
+def run(args):
+    """ run all benchmarks against a fake AXL server and return the
+        results as dict. The clients use the default caching, but in a
+        temporary directory.
+    """
+    results = dict()
+    with temporary_cache(), FakeAXLServer(rows=args.rows, latency=args.latency, throttle=args.throttle) as server:
+        settings = pyaxl.AXLClientSettings(host=server.url, user='benchmark', passwd='benchmark',
+                                           path='axl/', version=args.version, schema_path=args.schema_path,
+                                           keepalive=args.keepalive, http_pool_size=args.workers,
+                                           pool_size=args.workers,
+                                           rate_limit_read=args.rate, rate_limit_write=args.rate)
+        pyaxl.registry.register(settings, CONFIGNAME)
+        for name, benchmark in BENCHMARKS:
+            if args.only and name not in args.only:
+                continue
+            print('run %s ...' % name, file=sys.stderr)
+            for key, (value, unit) in benchmark(args).items():
+                results[key] = dict(value=value, unit=unit)
+        requests = dict(server.requests)
+    return dict(time=datetime.datetime.utcnow().isoformat(),
+                commit=commit(),
+                python=platform.python_version(),
+                parameters=dict(rows=args.rows, objects=args.objects, latency=args.latency,
+                                throttle=args.throttle, rate=args.rate, workers=args.workers,
+                                keepalive=args.keepalive, version=args.version),
+                requests=requests,
+                results=results)
+
+
+def compare(old, new):
+    """ print the change of each result compared to an older run.
+    """
+    print('%-20s %14s %14s %9s' % ('benchmark', 'before', 'after', 'change'))
+    for key, result in sorted(new['results'].items()):
+        before = old['results'].get(key)
+        if before is None or not before['value']:
+            print('%-20s %14s %14.4g %9s %s' % (key, '-', result['value'], '-', result['unit']))
+            continue
+        change = (result['value'] - before['value']) / before['value'] * 100
+        print('%-20s %14.4g %14.4g %+8.1f%% %s' % (key, before['value'], result['value'], change, result['unit']))
+
+
+def commit():
+    """ return the git commit of the working directory or None.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark pyaxl against a local fake AXL server.')
+    parser.add_argument('schema_path', help='path to the AXL schema of the version (AXLAPI.wsdl)')
+    parser.add_argument('-o', '--output', default='pyaxl-benchmark.json', help='file for the results as json')
+    parser.add_argument('-c', '--compare', help='results of an earlier run to compare with')
+    parser.add_argument('-v', '--version', default='10.5', help='AXL version of the schema')
+    parser.add_argument('-r', '--rows', type=int, default=5000, help='rows returned by list and sql queries')
+    parser.add_argument('-n', '--objects', type=int, default=200, help='objects to get, update and create')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='workers for get_many')
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help='latency of the server in seconds')
+    parser.add_argument('-t', '--throttle', type=float, default=0.0, help='probability of throttled requests')
+    parser.add_argument('-R', '--rate', type=float, default=0, help='rate limit for reads and writes, '
+                        'needed to retry throttled requests')
+    parser.add_argument('-k', '--keepalive', action='store_true', help='use the keepalive transport')
+    parser.add_argument('--only', nargs='*', choices=[name for name, benchmark in BENCHMARKS],
+                        help='run only these benchmarks')
+    args = parser.parse_args(argv)
+    results = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print('results written to %s' % args.output, file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    else:
+        compare(dict(results=dict()), results)
+
+
+if __name__ == '__main__':
+    main()
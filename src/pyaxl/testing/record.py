@@ -0,0 +1,169 @@
+import io
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import zipfile
+from copy import deepcopy
+from collections import deque
+from suds.transport import Reply
+from suds.transport import Transport
+from suds.transport import TransportError
+
+from pyaxl import exceptions
+
+
+log = logging.getLogger('pyaxl')
+
+INDEX = 'index.json'
+SCRUBBED = b'***'
+SCRUB_TAGS = (b'password', b'pin', b'digestCredentials', b'userPassword', b'passwd')
+REGEX_SCRUB = re.compile(rb'(<(?:[\w-]+:)?(?:%s)(?:\s[^>]*)?>)[^<]*(</)' % b'|'.join(SCRUB_TAGS))
+REGEX_OPERATION = re.compile(rb'<(?:[\w-]+:)?Body[^>]*>\s*<(?:[\w-]+:)?([\w-]+)')
+
+
+class RecordingTransport(Transport):
+    """ Transport which sends the requests with another transport and
+        records each request and its reply in an archive (zip file).
+        Passwords and PINs in the messages are scrubbed, the credentials
+        of the transport are never recorded. The archive is complete
+        after close was called.
+
+        Copies of the transport (pooled clients) record into the
+        same archive.
+    """
+
+    def __init__(self, transport, path, archive=None):
+        super(RecordingTransport, self).__init__()
+        self.transport = transport
+        self.options = transport.options
+        self.archive = archive or Archive(path)
+
+    def __deepcopy__(self, memo):
+        return self.__class__(deepcopy(self.transport, memo), self.archive.path, self.archive)
+
+    def open(self, request):
+        return self.transport.open(request)
+
+    def send(self, request):
+        start = time.monotonic()
+        try:
+            reply = self.transport.send(request)
+        except TransportError as e:
+            body = e.fp is not None and e.fp.read() or b''
+            e.fp = io.BytesIO(body)
+            self.archive.add(request.message, e.httpcode, body, time.monotonic() - start)
+            raise
+        if reply is None:
+            self.archive.add(request.message, 202, b'', time.monotonic() - start)
+        else:
+            self.archive.add(request.message, reply.code, reply.message, time.monotonic() - start)
+        return reply
+
+    def close(self):
+        self.archive.close()
+
+
+class Archive(object):
+    """ Zip file with the recorded requests and replies and an index
+        with the operation, the key of the request, the status and the
+        duration of each of them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self.index = list()
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, request, status, reply, duration):
+        request = scrub(request)
+        entry = dict(operation=operation(request), key=key(request), status=status,
+                     duration=duration, time=time.monotonic() - self.start)
+        with self.lock:
+            entry['id'] = len(self.index) + 1
+            self.zip.writestr('requests/%s.xml' % entry['id'], request)
+            self.zip.writestr('replies/%s.xml' % entry['id'], scrub(reply))
+            self.index.append(entry)
+
+    def close(self):
+        with self.lock:
+            if self.zip.fp is None:
+                return
+            self.zip.writestr(INDEX, json.dumps(dict(version=1, exchanges=self.index)))
+            self.zip.close()
+        log.info('%s requests recorded in %s' % (len(self.index), self.path))
+
+
+class ReplayTransport(Transport):
+    """ Transport which answers the requests with the replies of an
+        archive written by RecordingTransport. A request is found by its
+        content, if the same request was recorded more than once, the
+        replies are returned in the recorded order and the last one is
+        repeated. With timing each reply is delayed by the recorded
+        duration.
+    """
+
+    def __init__(self, path, timing=False, replies=None):
+        super(ReplayTransport, self).__init__()
+        self.path = path
+        self.timing = timing
+        self.replies = replies or Replies(path)
+
+    def __deepcopy__(self, memo):
+        return self.__class__(self.path, self.timing, self.replies)
+
+    def open(self, request):
+        raise exceptions.ReplayException('only AXL requests can be replayed')
+
+    def send(self, request):
+        entry, message = self.replies.get(scrub(request.message))
+        if self.timing:
+            time.sleep(entry['duration'])
+        if entry['status'] in (200, 202):
+            return Reply(entry['status'], {'Content-Type': 'text/xml; charset=utf-8'}, message or None)
+        raise TransportError('recorded error %s' % entry['status'], entry['status'], io.BytesIO(message))
+
+
+class Replies(object):
+    """ The replies of an archive in memory, by the key of the request.
+    """
+
+    def __init__(self, path):
+        self.replies = dict()
+        self.lock = threading.Lock()
+        with zipfile.ZipFile(path) as archive:
+            index = json.loads(archive.read(INDEX).decode('utf-8'))
+            for entry in index['exchanges']:
+                message = archive.read('replies/%s.xml' % entry['id'])
+                self.replies.setdefault(entry['key'], deque()).append((entry, message))
+        log.info('%s requests loaded from %s' % (len(index['exchanges']), path))
+
+    def get(self, request):
+        replies = self.replies.get(key(request))
+        if replies is None:
+            raise exceptions.ReplayException('%s request was not recorded' % operation(request))
+        with self.lock:
+            if len(replies) > 1:
+                return replies.popleft()
+            return replies[0]
+
+
+def scrub(message):
+    """ replace passwords and PINs in a message.
+    """
+    if isinstance(message, str):
+        message = message.encode('utf-8')
+    return REGEX_SCRUB.sub(rb'\1%s\2' % SCRUBBED, message or b'')
+
+
+def operation(message):
+    match = REGEX_OPERATION.search(message)
+    return match is not None and match.group(1).decode('utf-8') or None
+
+
+def key(message):
+    return hashlib.sha1(message).hexdigest()
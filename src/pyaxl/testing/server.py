@@ -0,0 +1,219 @@
+import os
+import re
+import time
+import uuid
+import random
+import logging
+import threading
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+from xml.etree.ElementTree import fromstring
+from http.server import HTTPServer
+from http.server import BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+
+log = logging.getLogger('pyaxl')
+
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+ENVELOPE = ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soapenv:Envelope xmlns:soapenv="%s"><soapenv:Body>%%s</soapenv:Body></soapenv:Envelope>' % SOAP_NS)
+RESPONSE = '<ns:%(operation)sResponse xmlns:ns=%(ns)s><return>%(body)s</return></ns:%(operation)sResponse>'
+FAULT = ('<soapenv:Fault><faultcode>soapenv:Server</faultcode><faultstring>%s</faultstring>'
+         '<detail><axlError><axlcode>-1</axlcode><axlmessage>%s</axlmessage></axlError></detail></soapenv:Fault>')
+THROTTLED = 'AXL web service is throttled'
+SQL_TOO_LARGE = 'Query request too large. Total rows matched: %s rows. Suggestive Row Fetch: less than %s rows'
+# canned replies of get requests, the uuid is replaced
+GET_REPLIES = dict(getUser='10.5_user_riols_get.xml')
+REGEX_SQL = re.compile(r'^\s*SELECT\s+(?:SKIP\s+(\d+)\s+)?(?:FIRST\s+(\d+)\s+)?(.*?)\s+FROM\s', re.I | re.S)
+REGEX_RETURN = re.compile(r'<return>.*</return>', re.S)
+
+
+class FakeAXLServer(ThreadingMixIn, HTTPServer):
+    """ Local HTTP server which answers AXL requests like callmanager,
+        but with generated data. It's used to measure pyaxl without
+        a callmanager, see pyaxl.testing.benchmark.
+
+        rows: number of objects returned by list and executeSQLQuery
+        latency: seconds to wait before each reply
+        throttle: probability that a request is refused with HTTP 503
+        sql_limit: maximum rows of an executeSQLQuery, like callmanager
+                   a larger query fails with "Query request too large"
+
+        list requests support skip and first, executeSQLQuery SKIP and
+        FIRST. The server counts the requests per operation in requests
+        and the opened connections in connections.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, rows=100, latency=0.0, throttle=0.0, sql_limit=None, seed=0):
+        super(FakeAXLServer, self).__init__((host, port), FakeAXLHandler)
+        self.rows = rows
+        self.latency = latency
+        self.throttle = throttle
+        self.sql_limit = sql_limit
+        self.random = random.Random(seed)
+        self.requests = dict()
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='FakeAXLServer')
+        self.thread.daemon = True
+        self.thread.start()
+        log.info('fake AXL server listens on %s' % self.url)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+    def count(self, operation):
+        with self.lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def connected(self):
+        with self.lock:
+            self.connections += 1
+
+    def throttled(self):
+        with self.lock:
+            return self.random.random() < self.throttle
+
+    def reply(self, operation, ns, request):
+        """ return the status and the SOAP body for a request.
+        """
+        if operation.startswith('list'):
+            return 200, self.reply_list(operation, ns, request)
+        if operation.startswith('get') and operation in GET_REPLIES:
+            return 200, self.reply_canned(operation, ns, request)
+        if operation.startswith('get'):
+            return 200, self.reply_get(operation, ns, request)
+        if operation == 'executeSQLQuery':
+            return self.reply_sql(operation, ns, request)
+        if operation == 'executeSQLUpdate':
+            return 200, RESPONSE % dict(operation=operation, ns=quoteattr(ns), body='<rowsUpdated>1</rowsUpdated>')
+        pkid = text(find(request, 'uuid')) or objectid(self.random.getrandbits(32))
+        return 200, RESPONSE % dict(operation=operation, ns=quoteattr(ns), body=escape(pkid))
+
+    def reply_list(self, operation, ns, request):
+        tag = operation[4].lower() + operation[5:]
+        returned = find(request, 'returnedTags')
+        returned = returned is not None and list(returned) or list()
+        skip = int(text(find(request, 'skip')) or 0)
+        first = text(find(request, 'first'))
+        end = self.rows if first is None else min(self.rows, skip + int(first))
+        items = list()
+        for i in range(skip, end):
+            values = ''.join([element(e, i) for e in returned])
+            items.append('<%s uuid="%s">%s</%s>' % (tag, objectid(i), values, tag))
+        return RESPONSE % dict(operation=operation, ns=quoteattr(ns), body=''.join(items))
+
+    def reply_get(self, operation, ns, request):
+        tag = operation[3].lower() + operation[4:]
+        pkid = text(find(request, 'uuid')) or objectid(0)
+        name = text(find(request, 'name')) or '%s0' % tag
+        body = '<%s uuid="%s"><name>%s</name></%s>' % (tag, escape(pkid), escape(name), tag)
+        return RESPONSE % dict(operation=operation, ns=quoteattr(ns), body=body)
+
+    def reply_canned(self, operation, ns, request):
+        path = os.path.join(os.path.dirname(__file__), 'soap', GET_REPLIES[operation])
+        with open(path, encoding='utf-8') as f:
+            body = REGEX_RETURN.search(f.read()).group(0)[len('<return>'):-len('</return>')]
+        pkid = text(find(request, 'uuid'))
+        if pkid is not None:
+            body = re.sub(r'uuid="[^"]*"', 'uuid="%s"' % escape(pkid), body, count=1)
+        return RESPONSE % dict(operation=operation, ns=quoteattr(ns), body=body)
+
+    def reply_sql(self, operation, ns, request):
+        match = REGEX_SQL.match(text(find(request, 'sql')) or '')
+        if match is None:
+            return 500, FAULT % ('invalid sql', 'invalid sql')
+        skip, first, columns = match.groups()
+        skip = int(skip or 0)
+        end = self.rows if first is None else min(self.rows, skip + int(first))
+        if self.sql_limit is not None and end - skip > self.sql_limit:
+            message = SQL_TOO_LARGE % (end - skip, self.sql_limit)
+            return 500, FAULT % (message, message)
+        names = [c.split()[-1].split('.')[-1] for c in columns.split(',')]
+        if names == ['*']:
+            names = ['pkid', 'name']
+        rows = list()
+        for i in range(skip, end):
+            values = ''.join(['<%s>%s</%s>' % (n, n == 'pkid' and objectid(i)[1:-1].lower() or '%s%s' % (n, i), n)
+                              for n in names])
+            rows.append('<row>%s</row>' % values)
+        return 200, RESPONSE % dict(operation=operation, ns=quoteattr(ns), body=''.join(rows))
+
+
+class FakeAXLHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super(FakeAXLHandler, self).setup()
+        self.server.connected()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        envelope = fromstring(body)
+        request = envelope.find('{%s}Body' % SOAP_NS)[0]
+        ns, operation = request.tag[1:].split('}')
+        self.server.count(operation)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.throttled():
+            return self.send(503, THROTTLED.encode('utf-8'), 'text/plain')
+        status, reply = self.server.reply(operation, ns, request)
+        self.send(status, (ENVELOPE % reply).encode('utf-8'))
+
+    def send(self, status, message, contenttype='text/xml; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', contenttype)
+        self.send_header('Content-Length', str(len(message)))
+        self.end_headers()
+        self.wfile.write(message)
+
+    def log_message(self, format, *args):
+        log.debug('fake AXL server: %s' % (format % args))
+
+
+def objectid(i):
+    return '{%s}' % str(uuid.UUID(int=i)).upper()
+
+
+def find(request, name):
+    """ return the first element with the local name in the request.
+    """
+    for e in request.iter():
+        if e.tag.rsplit('}', 1)[-1] == name:
+            return e
+    return None
+
+
+def text(element):
+    return element is not None and element.text or None
+
+
+def element(tag, i):
+    """ return an element like the requested tag with a generated value.
+    """
+    name = tag.tag.rsplit('}', 1)[-1]
+    children = list(tag)
+    if children:
+        return '<%s>%s</%s>' % (name, ''.join([element(c, i) for c in children]), name)
+    return '<%s>%s%s</%s>' % (name, name, i, name)
@@ -6,21 +6,37 @@ from xml.dom.minidom import parseString
 
 class TestingTransport(Transport):
 
-    _output_file = None
-    _lastrequest = None
+    def __init__(self, state=None):
+        super(TestingTransport, self).__init__()
+        if state is None:
+            state = dict(output_file=None, operations=dict(), lastrequest=None)
+        self._state = state
 
-    def define(self, xmlfile):
+    def __deepcopy__(self, memo):
+        """ Pooled clients get a copy of the transport. All copies
+            share the defined xml file and the last request.
+        """
+        return self.__class__(self._state)
+
+    def define(self, xmlfile, **operations):
         """ Define a xml file to use for the reply
             as return value from the send method.
             Format: <xmlfile>_<method>.xml
+            Other xml files can be given for single operations,
+            e.g. executeSQLQuery='10.5_sql_cups'. With a list of xml
+            files the operation gets one after the other, the last
+            one is used for all further requests. An exception in the
+            list is raised instead of a reply, like a lost connection.
         """
-        self._output_file = xmlfile
+        self._state['output_file'] = xmlfile
+        self._state['operations'] = dict([(k, isinstance(v, (list, tuple)) and list(v) or v)
+                                          for k, v in operations.items()])
 
     def lastrequest(self):
         """ Returns the last used request which was been sent
             to the callmanager, so that we can validate it
         """
-        return self._lastrequest
+        return self._state['lastrequest']
 
     def send(self, request):
         """ Returns a fake Reply builded with data from a xml file.
@@ -30,20 +46,29 @@ class TestingTransport(Transport):
         dom = parseString(request.message)
         body = dom.documentElement.getElementsByTagNameNS('*', 'Body')[0]
         method = body.firstChild.localName
+        output_file = self._state['output_file']
 
-        if method.startswith('get'):
-            filename = '%s_get.xml' % self._output_file
+        if method in self._state['operations']:
+            files = self._state['operations'][method]
+            if isinstance(files, list):
+                files = len(files) > 1 and files.pop(0) or files[0]
+            if isinstance(files, Exception):
+                self._state['lastrequest'] = request
+                raise files
+            filename = '%s.xml' % files
+        elif method.startswith('get'):
+            filename = '%s_get.xml' % output_file
         elif method.startswith('list'):
-            filename = '%s_list.xml' % self._output_file
+            filename = '%s_list.xml' % output_file
         elif method.startswith('update'):
-            filename = '%s_update.xml' % self._output_file
+            filename = '%s_update.xml' % output_file
         elif method.startswith('remove'):
-            filename = '%s_remove.xml' % self._output_file
+            filename = '%s_remove.xml' % output_file
         elif method.startswith('add'):
-            filename = '%s_add.xml' % self._output_file
+            filename = '%s_add.xml' % output_file
         else:
-            filename = '%s.xml' % self._output_file
+            filename = '%s.xml' % output_file
         with open(os.path.join(os.path.dirname(__file__), 'soap', filename), 'rb') as f:
             message = f.read()
-        self._lastrequest = request
+        self._state['lastrequest'] = request
         return Reply(200, request.headers, message)
@@ -0,0 +1,236 @@
+import io
+import ssl
+import gzip
+import zlib
+import time
+import logging
+import threading
+import http.client
+import urllib.request
+from urllib.parse import urlsplit
+
+from suds.transport import Reply
+from suds.transport import TransportError
+from suds.properties import Unskin
+from suds.transport.http import HttpAuthenticated
+
+import pyaxl
+from pyaxl import metrics
+
+
+log = logging.getLogger('pyaxl')
+
+STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class ConnectionPool(object):
+    """ The open connections to callmanager, at most size per host. A
+        request waits until a connection is free if all are in use. Idle
+        connections are closed after idle_timeout seconds.
+    """
+
+    pools = dict()
+    lock = threading.Lock()
+
+    def __init__(self, size=4, idle_timeout=60):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.idle = dict()
+        self.connections = dict()
+        self.condition = threading.Condition()
+
+    @classmethod
+    def get_pool(cls, configname):
+        """ return the pool of a configuration, it's shared by all
+            clients of the configuration.
+        """
+        pool = cls.pools.get(configname)
+        if pool is not None:
+            return pool
+        config = pyaxl.configuration.registry.get(configname)
+        with cls.lock:
+            if configname not in cls.pools:
+                cls.pools[configname] = ConnectionPool(config.http_pool_size, config.http_idle_timeout)
+            return cls.pools[configname]
+
+    def get(self, key, connect):
+        """ return an idle connection or a new one made with connect,
+            and if it was reused.
+        """
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                idle = self.idle.get(key, list())
+                while idle:
+                    conn, used = idle.pop()
+                    if now - used < self.idle_timeout:
+                        return conn, True
+                    self._close(key, conn)
+                if self.connections.get(key, 0) < self.size:
+                    self.connections[key] = self.connections.get(key, 0) + 1
+                    break
+                self.condition.wait()
+        try:
+            return connect(key), False
+        except Exception:
+            self.discard(key, None)
+            raise
+
+    def put(self, key, conn):
+        """ give a connection back to the pool.
+        """
+        with self.condition:
+            self.idle.setdefault(key, list()).append((conn, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, key, conn):
+        """ close a connection which can't be used anymore.
+        """
+        with self.condition:
+            self._close(key, conn)
+            self.condition.notify()
+
+    def close(self):
+        """ close all idle connections.
+        """
+        with self.condition:
+            for key, idle in self.idle.items():
+                for conn, used in idle:
+                    self._close(key, conn)
+            self.idle = dict()
+            self.condition.notify_all()
+
+    def _close(self, key, conn):
+        if conn is not None:
+            conn.close()
+        self.connections[key] -= 1
+
+
+class KeepAliveTransport(HttpAuthenticated):
+    """ http transport which keeps the connections to callmanager open
+        and reuses them for the next requests. So the TCP and TLS handshake
+        is done only once per connection and not for each request. The
+        session cookies (e.g. JSESSIONIDSSO) returned by callmanager are
+        sent with every following request.
+
+        The connections are taken from pool, a ConnectionPool which can be
+        shared by many transports. Without a pool, the transport gets its
+        own one with pool_size and idle_timeout. Copies of the transport
+        share the pool.
+    """
+
+    def __init__(self, pool_size=4, idle_timeout=60, context=None, pool=None, **kwargs):
+        super(KeepAliveTransport, self).__init__(**kwargs)
+        if pool is None:
+            pool = ConnectionPool(pool_size, idle_timeout)
+        self.pool = pool
+        self.context = context
+
+    def __deepcopy__(self, memo=None):
+        clone = self.__class__(context=self.context, pool=self.pool)
+        Unskin(clone.options).update(Unskin(self.options))
+        return clone
+
+    def send(self, request):
+        self.addcredentials(request)
+        msg = request.message
+        headers = dict(request.headers)
+        encoding = headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            msg = gzip.compress(msg)
+        elif encoding == 'deflate':
+            msg = zlib.compress(msg)
+        u2request = urllib.request.Request(request.url, msg, headers)
+        self.addcookies(u2request)
+        headers.update(u2request.unredirected_hdrs)
+        log.debug('sending:\n%s', request)
+        response, message = self._send(request.url, msg, headers, getattr(request, 'timeout', None))
+        self.getcookies(response, u2request)
+        if response.status in (http.client.ACCEPTED, http.client.NO_CONTENT):
+            return None
+        if response.status != http.client.OK:
+            raise TransportError(response.reason, response.status, io.BytesIO(message))
+        encoding = response.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            message = gzip.decompress(message)
+        elif encoding == 'deflate':
+            message = zlib.decompress(message)
+        reply = Reply(http.client.OK, response.headers, message)
+        log.debug('received:\n%s', reply)
+        return reply
+
+    def close(self):
+        """ close all idle connections of the pool.
+        """
+        self.pool.close()
+
+    def _send(self, url, msg, headers, timeout):
+        """ post the message over a pooled connection. If a reused connection
+            was already closed by the server, the request is sent again
+            over a new one.
+        """
+        split = urlsplit(url)
+        key = split.scheme, split.hostname, split.port
+        path = split.path or '/'
+        if split.query:
+            path = '%s?%s' % (path, split.query)
+        while True:
+            conn, reused = self.pool.get(key, self._connect)
+            self._timeout(conn, timeout or self.options.timeout)
+            try:
+                conn.request('POST', self._proxied(key, path), msg, headers)
+                sent = time.monotonic()
+                response = conn.getresponse()
+                measurement = metrics.current()
+                if measurement is not None:
+                    measurement.server = (measurement.server or 0.0) + time.monotonic() - sent
+                message = response.read()
+            except STALE_ERRORS:
+                self.pool.discard(key, conn)
+                if reused:
+                    log.debug('connection to %s was closed by server, reconnect' % split.hostname)
+                    continue
+                raise
+            except Exception:
+                self.pool.discard(key, conn)
+                raise
+            if response.will_close:
+                self.pool.discard(key, conn)
+            else:
+                self.pool.put(key, conn)
+            return response, message
+
+    def _connect(self, key):
+        """ open a new connection, over the proxy if one is configured.
+        """
+        scheme, host, port = key
+        proxy = self.options.proxy.get(scheme)
+        log.debug('open new connection to %s://%s:%s' % (scheme, host, port))
+        if proxy is None:
+            if scheme == 'https':
+                return http.client.HTTPSConnection(host, port, context=self._context())
+            return http.client.HTTPConnection(host, port)
+        proxy = urlsplit(proxy if '://' in proxy else '//%s' % proxy)
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(proxy.hostname, proxy.port, context=self._context())
+            conn.set_tunnel(host, port)
+            return conn
+        return http.client.HTTPConnection(proxy.hostname, proxy.port)
+
+    def _proxied(self, key, path):
+        """ plain http over a proxy needs the absolute url.
+        """
+        scheme, host, port = key
+        if scheme == 'http' and self.options.proxy.get(scheme) is not None:
+            return '%s://%s%s' % (scheme, host if port is None else '%s:%s' % (host, port), path)
+        return path
+
+    def _context(self):
+        if self.context is None:
+            self.context = ssl.create_default_context()
+        return self.context
+
+    def _timeout(self, conn, timeout):
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
@@ -1,4 +1,8 @@
 import re
+from copy import copy
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from suds.sudsobject import Object
 
 
 REGEX_UUID = re.compile(r'^\{?([0-9a-f]{8}-(?:[0-9a-f]{4}-){3}[0-9a-f]{12})\}?$')
@@ -15,6 +19,27 @@ def uuid(value):
     return returnvalue
 
 
+class UUIDDict(dict):
+    """ dict with uuids as keys. The keys are stored as blank uuids,
+        so the lookup works with every format of the uuid.
+    """
+
+    def __getitem__(self, key):
+        return super(UUIDDict, self).__getitem__(uuid(key))
+
+    def __setitem__(self, key, value):
+        super(UUIDDict, self).__setitem__(uuid(key), value)
+
+    def __contains__(self, key):
+        return super(UUIDDict, self).__contains__(uuid(key))
+
+    def get(self, key, default=None):
+        return super(UUIDDict, self).get(uuid(key), default)
+
+    def setdefault(self, key, default=None):
+        return super(UUIDDict, self).setdefault(uuid(key), default)
+
+
 def axlbool(value):
     """ convert suds.sax.text.Text to python bool
     """
@@ -25,3 +50,49 @@ def axlbool(value):
     if value.lower() == 'true':
         return True
     return False
+
+
+def imap_ordered(func, iterable, workers):
+    """ like map but call func in a pool of workers threads. The results
+        are returned in the same order as the iterable, while the following
+        calls are still running. At most twice the number of workers
+        are in flight.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def copy_object(obj):
+    """ copy a suds object with all nested objects and lists. Unlike
+        deepcopy the metadata with the xsd type is not copied.
+    """
+    if isinstance(obj, list):
+        return [copy_object(i) for i in obj]
+    if not isinstance(obj, Object):
+        return obj
+    clone = copy(obj)
+    for key in obj.__keylist__:
+        clone.__dict__[key] = copy_object(obj.__dict__[key])
+    clone.__keylist__ = list(obj.__keylist__)
+    return clone
+
+
+def plain(value):
+    """ convert suds objects, also nested in lists and dicts, to
+        dicts, lists and str. The result can be compared with ==.
+    """
+    if isinstance(value, Object):
+        return dict([(k, plain(getattr(value, k))) for k in value.__keylist__])
+    if isinstance(value, dict):
+        return dict([(k, plain(v)) for k, v in value.items()])
+    if isinstance(value, (list, tuple)):
+        return [plain(i) for i in value]
+    if isinstance(value, str):
+        return str(value)
+    return value